@@ -4,26 +4,227 @@ AI分析模块
 """
 import openai
 import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-from config.settings import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL
+from config.settings import (DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL, LLM_CACHE_ENABLED, LLM_CACHE_PATH,
+                             LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, AI_MAX_CONCURRENCY, AI_CALL_TIMEOUT,
+                             AI_STREAM_TIMEOUT, AI_BATCH_TOKEN_BUDGET, AI_BATCH_MAX_SYMBOLS, AI_PROMPT_TOKEN_BUDGET)
 from data.data_provider import data_provider
+from analysis.llm_cache import LLMCache, cache_key
+from analysis.prompt_builder import PromptBuilder, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+STOCK_ANALYST_PROMPT = "你是一位专业的股票分析师，提供准确、客观的分析和建议。"
+
+# 各类分析拉取的数据窗口（自然日，需要足够计算RSI、MACD和30日支撑/阻力位）和发送的K线数
+STOCK_ANALYSIS_DAYS = 60
+STOCK_ANALYSIS_BARS = 20
+STRATEGY_DAYS = 100
+STRATEGY_BARS = 60
+BATCH_BARS = 10
+
+# 批量分析时每只股票预留的输出token数
+BATCH_OUTPUT_TOKENS_PER_SYMBOL = 150
+
+RECOMMENDATIONS = ('BUY', 'HOLD', 'SELL')
+
+
+def _to_price(value) -> Optional[float]:
+    try:
+        return round(float(value), 2) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _batch_reply_complete(content: str, symbols: List[str]) -> bool:
+    """批量分析的回复是否为合法JSON且包含全部股票，只有完整的回复才写入缓存"""
+    try:
+        items = json.loads(content).get('results', [])
+        returned = {item.get('symbol') for item in items if isinstance(item, dict)}
+    except (ValueError, AttributeError, TypeError):
+        return False
+    return set(symbols) <= returned
+
 class AIAnalyzer:
-    def __init__(self):
+    def __init__(self, cache: LLMCache = None):
         if not DEEPSEEK_API_KEY:
             raise ValueError("DEEPSEEK_API_KEY is not set in environment variables")
         
         # 配置OpenAI客户端使用DeepSeek API
         self.client = openai.OpenAI(
             api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL
+            base_url=DEEPSEEK_BASE_URL,
+            timeout=AI_CALL_TIMEOUT
         )
         self.model = DEEPSEEK_MODEL
+        # 提示词构建和token预算
+        self.prompts = PromptBuilder(AI_PROMPT_TOKEN_BUDGET)
+        # 限制同时在途的请求数，盘后分析并发调用和Web请求共用
+        self._semaphore = threading.BoundedSemaphore(max(1, AI_MAX_CONCURRENCY))
+        # AI回复缓存，为空时每次都请求API
+        self.cache = cache
+
+    def _chat(self, system_prompt: str, prompt: str, temperature: float, max_tokens: int,
+              json_output: bool = False, validate: Callable[[str], bool] = None) -> str:
+        """
+        调用DeepSeek API，相同的模型、提示词和参数在缓存有效期内直接返回之前的回复
+        因 max_tokens 截断的回复不写入缓存
+        :param json_output: 是否要求模型输出JSON对象（提示词中需要说明JSON格式）
+        :param validate: 可选的回复校验函数，返回False时不写入缓存，下次重新请求
+        :return: 回复文本
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        options = {"response_format": {"type": "json_object"}} if json_output else {}
+        key = cache_key(self.model, messages, temperature=temperature, max_tokens=max_tokens, **options)
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.error(f"Error reading AI cache: {str(e)}")
+
+        with self._semaphore:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **options
+            )
+        content = response.choices[0].message.content
+        if response.choices[0].finish_reason == 'length':
+            logger.warning(f"AI reply truncated at {max_tokens} tokens, not caching")
+            return content
+        if validate is not None and not validate(content):
+            logger.warning("AI reply failed validation, not caching")
+            return content
+
+        if self.cache is not None:
+            try:
+                tokens = response.usage.total_tokens if getattr(response, 'usage', None) else 0
+                self.cache.put(key, self.model, content, tokens=tokens)
+            except Exception as e:
+                logger.error(f"Error writing AI cache: {str(e)}")
+        return content
+
+    def _chat_stream(self, system_prompt: str, prompt: str, temperature: float, max_tokens: int) -> Iterator[str]:
+        """
+        流式调用DeepSeek API，逐段产出回复文本
+        与 _chat 共用缓存：命中时一次性产出缓存的回复，完整生成后写入缓存
+        并发名额在生成器结束或被关闭（如客户端断开）时释放；总时长超过 AI_STREAM_TIMEOUT 时断开并抛出 TimeoutError，
+        避免读取缓慢的客户端长期占用名额
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        key = cache_key(self.model, messages, temperature=temperature, max_tokens=max_tokens)
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    yield cached
+                    return
+            except Exception as e:
+                logger.error(f"Error reading AI cache: {str(e)}")
+
+        parts, tokens, finish_reason = [], 0, None
+        if not self._semaphore.acquire(timeout=AI_CALL_TIMEOUT):
+            raise TimeoutError(f"No AI request slot available within {AI_CALL_TIMEOUT:.0f}s")
+        stream = None
+        try:
+            deadline = time.monotonic() + AI_STREAM_TIMEOUT
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"AI stream exceeded {AI_STREAM_TIMEOUT:.0f}s")
+                if getattr(chunk, 'usage', None):
+                    tokens = chunk.usage.total_tokens
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            # 客户端提前断开或超时时关闭连接，停止生成
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+            self._semaphore.release()
+
+        if finish_reason == 'length':
+            logger.warning(f"AI reply truncated at {max_tokens} tokens, not caching")
+            return
+        if self.cache is not None:
+            try:
+                self.cache.put(key, self.model, "".join(parts), tokens=tokens)
+            except Exception as e:
+                logger.error(f"Error writing AI cache: {str(e)}")
+
+    def get_cache_stats(self):
+        """获取AI回复缓存命中统计"""
+        if self.cache is None:
+            return {"enabled": False}
+        return dict(self.cache.stats(), enabled=True)
+
+    def _stock_analysis_prompt(self, symbol: str, additional_context: str = "") -> Optional[tuple]:
+        """
+        构建单股分析的提示词
+        :return: (提示词, 当前价格)，没有数据时返回None
+        """
+        # 获取股票数据
+        stock_data = data_provider.get_stock_data(symbol, period='daily', days=STOCK_ANALYSIS_DAYS)
+        if stock_data.empty:
+            return None
+        latest_price = float(stock_data['close'].iloc[-1])
+        
+        # 构建分析提示：紧凑K线表和预先计算的指标，超出token预算时减少K线数（指标只计算一次）
+        summary = self.prompts.indicator_summary(symbol, stock_data)
+
+        def build(rows: int) -> str:
+            prompt = (f"请对股票 {symbol} 进行详细分析，基于以下数据：\n\n"
+                      f"{self.prompts.stock_context(symbol, stock_data, rows, summary)}\n\n"
+                      "请提供以下分析：\n"
+                      "1. 技术面分析（趋势、支撑位、阻力位等）\n"
+                      "2. 短期走势预测（未来1-5个交易日）\n"
+                      "3. 投资建议（买入/持有/卖出）\n"
+                      "4. 风险提示\n"
+                      "5. 目标价位和止损位\n"
+                      "请使用简洁明确的语言，避免模糊表达。")
+            if additional_context:
+                prompt += f"\n额外上下文: {additional_context}"
+            return prompt
+        
+        prompt = self.prompts.fit(build, STOCK_ANALYSIS_BARS)
+        return prompt, latest_price
+
+    def _stock_analysis_result(self, symbol: str, content: str, latest_price) -> Dict:
+        return {
+            "symbol": symbol,
+            "timestamp": datetime.now().isoformat(),
+            "analysis": content,
+            "current_price": latest_price,
+            "recommendation": self._extract_recommendation(content)
+        }
 
     def analyze_stock(self, symbol: str, additional_context: str = "") -> Dict:
         """
@@ -33,62 +234,140 @@ class AIAnalyzer:
         :return: AI分析结果
         """
         try:
-            # 获取股票数据
-            stock_data = data_provider.get_stock_data(symbol, period='daily', days=30)
-            if stock_data.empty:
+            built = self._stock_analysis_prompt(symbol, additional_context)
+            if built is None:
                 return {"error": f"No data available for {symbol}"}
-            
-            # 准备数据给AI分析
-            recent_data = stock_data.tail(10).to_dict('records')
-            latest_price = recent_data[-1]['close']
-            
-            # 构建分析提示
-            prompt = f"""
-            请对股票 {symbol} 进行详细分析，基于以下数据：
-            
-            最近10个交易日数据：
-            {json.dumps(recent_data, indent=2, default=str)}
-            
-            当前价格: {latest_price}
-            
-            请提供以下分析：
-            1. 技术面分析（趋势、支撑位、阻力位等）
-            2. 短期走势预测（未来1-5个交易日）
-            3. 投资建议（买入/持有/卖出）
-            4. 风险提示
-            5. 目标价位和止损位
-            
-            请使用简洁明确的语言，避免模糊表达。
-            """
-            
-            if additional_context:
-                prompt += f"\n额外上下文: {additional_context}"
+            prompt, latest_price = built
             
             # 调用DeepSeek API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一位专业的股票分析师，提供准确、客观的分析和建议。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
-            )
-            
-            analysis_result = {
-                "symbol": symbol,
-                "timestamp": datetime.now().isoformat(),
-                "analysis": response.choices[0].message.content,
-                "current_price": latest_price,
-                "recommendation": self._extract_recommendation(response.choices[0].message.content)
-            }
-            
-            return analysis_result
+            content = self._chat(STOCK_ANALYST_PROMPT, prompt, temperature=0.3, max_tokens=1500)
+            return self._stock_analysis_result(symbol, content, latest_price)
             
         except Exception as e:
             logger.error(f"Error analyzing {symbol}: {str(e)}")
             return {"error": f"Analysis failed for {symbol}: {str(e)}"}
 
+    def analyze_stock_stream(self, symbol: str, additional_context: str = "") -> Iterator[Tuple[str, object]]:
+        """
+        流式分析单个股票，边生成边返回
+        :return: 事件生成器，依次产出 ('delta', 文本片段)，最后产出 ('result', 与 analyze_stock 相同的分析结果)；
+                 失败时产出 ('error', 错误信息) 并结束
+        """
+        try:
+            built = self._stock_analysis_prompt(symbol, additional_context)
+            if built is None:
+                yield 'error', f"No data available for {symbol}"
+                return
+            prompt, latest_price = built
+            
+            parts = []
+            for delta in self._chat_stream(STOCK_ANALYST_PROMPT, prompt, temperature=0.3, max_tokens=1500):
+                parts.append(delta)
+                yield 'delta', delta
+            yield 'result', self._stock_analysis_result(symbol, "".join(parts), latest_price)
+            
+        except Exception as e:
+            logger.error(f"Error streaming analysis for {symbol}: {str(e)}")
+            yield 'error', f"Analysis failed for {symbol}: {str(e)}"
+
+    def _batch_symbol_block(self, symbol: str, stock_data) -> Tuple[str, float]:
+        """批量分析中单只股票的数据段"""
+        latest_price = float(stock_data['close'].iloc[-1])
+        return f"[{symbol}]\n{self.prompts.stock_context(symbol, stock_data, BATCH_BARS)}\n", latest_price
+
+    def _batch_prompt(self, blocks: List[str], additional_context: str = "") -> str:
+        prompt = (
+            "请逐一分析下列股票，每只股票的数据以 [股票代码] 开头：\n\n"
+            + "\n".join(blocks)
+            + "\n请只输出一个JSON对象，格式如下，results 中每只股票一项、不要遗漏：\n"
+            '{"results": [{"symbol": "股票代码", "recommendation": "BUY/HOLD/SELL", '
+            '"target_price": 目标价（数字）, "stop_loss": 止损价（数字）, "summary": "50字以内的技术面要点和风险提示"}]}'
+        )
+        if additional_context:
+            prompt += f"\n额外上下文: {additional_context}"
+        return prompt
+
+    def plan_batches(self, blocks: Dict[str, str], token_budget: int = AI_BATCH_TOKEN_BUDGET,
+                     max_symbols: int = AI_BATCH_MAX_SYMBOLS) -> List[List[str]]:
+        """
+        按token预算切分批次，每批的输入（系统提示词、说明和各股票数据）加预留输出不超过预算
+        单只股票超出预算时单独成批
+        :param blocks: {股票代码: 数据段}
+        :return: 每批的股票代码列表
+        """
+        overhead = estimate_tokens(STOCK_ANALYST_PROMPT) + estimate_tokens(self._batch_prompt([]))
+        batches, current, used = [], [], overhead
+        for symbol, block in blocks.items():
+            cost = estimate_tokens(block) + BATCH_OUTPUT_TOKENS_PER_SYMBOL
+            if current and (used + cost > token_budget or len(current) >= max_symbols):
+                batches.append(current)
+                current, used = [], overhead
+            current.append(symbol)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def _analyze_batch(self, symbols: List[str], blocks: Dict[str, str], prices: Dict[str, float],
+                       additional_context: str = "") -> Dict[str, Dict]:
+        """一次请求分析一批股票，解析每只股票的建议、目标价和止损价"""
+        prompt = self._batch_prompt([blocks[symbol] for symbol in symbols], additional_context)
+        try:
+            content = self._chat(STOCK_ANALYST_PROMPT, prompt, temperature=0.3,
+                                 max_tokens=BATCH_OUTPUT_TOKENS_PER_SYMBOL * len(symbols) + 100, json_output=True,
+                                 validate=lambda reply: _batch_reply_complete(reply, symbols))
+            items = json.loads(content).get('results', [])
+        except Exception as e:
+            logger.error(f"Error analyzing batch {symbols}: {str(e)}")
+            return {symbol: {"error": f"Batch analysis failed for {symbol}: {str(e)}"} for symbol in symbols}
+
+        timestamp = datetime.now().isoformat()
+        parsed = {}
+        for item in items:
+            symbol = item.get('symbol') if isinstance(item, dict) else None
+            if symbol not in prices:
+                continue
+            recommendation = str(item.get('recommendation', '')).upper()
+            parsed[symbol] = {
+                "symbol": symbol,
+                "timestamp": timestamp,
+                "current_price": prices[symbol],
+                "recommendation": recommendation if recommendation in RECOMMENDATIONS else "HOLD",
+                "target_price": _to_price(item.get('target_price')),
+                "stop_loss": _to_price(item.get('stop_loss')),
+                "summary": str(item.get('summary', ''))
+            }
+        return {symbol: parsed.get(symbol, {"error": f"No result returned for {symbol}"}) for symbol in symbols}
+
+    def analyze_stocks_batch(self, symbols: List[str], additional_context: str = "",
+                             token_budget: int = AI_BATCH_TOKEN_BUDGET) -> Dict[str, Dict]:
+        """
+        批量分析多只股票，多只股票共用一次请求的系统提示词和说明，要求模型输出结构化JSON
+        超出token预算时自动切分为多批并发请求
+        :param symbols: 股票代码列表
+        :param token_budget: 单次请求的token预算（输入加输出）
+        :return: {股票代码: {'symbol', 'timestamp', 'current_price', 'recommendation', 'target_price', 'stop_loss',
+                 'summary'}}，失败的股票为 {'error': 错误信息}
+        """
+        results, blocks, prices = {}, {}, {}
+        frames = dict(data_provider.get_stock_data_many(symbols, period='daily', days=STOCK_ANALYSIS_DAYS))
+        for symbol in symbols:
+            stock_data = frames.get(symbol)
+            if stock_data is None or stock_data.empty:
+                results[symbol] = {"error": f"No data available for {symbol}"}
+                continue
+            blocks[symbol], prices[symbol] = self._batch_symbol_block(symbol, stock_data)
+
+        batches = self.plan_batches(blocks, token_budget)
+        if len(batches) > 1:
+            logger.info(f"批量分析 {len(blocks)} 只股票，按token预算分为 {len(batches)} 批")
+        with ThreadPoolExecutor(max_workers=max(1, min(AI_MAX_CONCURRENCY, len(batches) or 1))) as executor:
+            futures = [executor.submit(self._analyze_batch, batch, blocks, prices, additional_context)
+                       for batch in batches]
+            for future in futures:
+                results.update(future.result())
+        return {symbol: results[symbol] for symbol in symbols}
+
     def _extract_recommendation(self, analysis_text: str) -> str:
         """
         从AI分析文本中提取投资建议
@@ -111,9 +390,10 @@ class AIAnalyzer:
         try:
             # 获取各股票数据
             market_data = {}
+            frames = dict(data_provider.get_stock_data_many(symbols, period='daily', days=5))
             for symbol in symbols:
-                stock_data = data_provider.get_stock_data(symbol, period='daily', days=5)
-                if not stock_data.empty:
+                stock_data = frames.get(symbol)
+                if stock_data is not None and not stock_data.empty:
                     latest = stock_data.iloc[-1]
                     prev = stock_data.iloc[-2] if len(stock_data) > 1 else latest
                     change_pct = ((latest['close'] - prev['close']) / prev['close']) * 100 if prev['close'] != 0 else 0
@@ -123,32 +403,23 @@ class AIAnalyzer:
                         "volume": latest['volume']
                     }
             
-            prompt = f"""
-            基于以下市场数据，请分析整体市场情绪和趋势：
-            
-            股票表现数据：
-            {json.dumps(market_data, indent=2, default=str)}
+            # 每只股票一行：收盘价、涨跌幅、成交量（万）
+            lines = [f"{symbol} 收盘 {data['current_price']:.2f} 涨跌 {data['change_pct']:+.2f}% 量 {data['volume'] / 10000:.1f}万"
+                     for symbol, data in market_data.items()]
+            prompt = ("基于以下市场数据，请分析整体市场情绪和趋势：\n\n"
+                      "股票表现数据：\n" + "\n".join(lines) + "\n\n"
+                      "请提供：\n"
+                      "1. 整体市场情绪（乐观/悲观/中性）\n"
+                      "2. 主要趋势判断\n"
+                      "3. 风险因素\n"
+                      "4. 投资策略建议")
             
-            请提供：
-            1. 整体市场情绪（乐观/悲观/中性）
-            2. 主要趋势判断
-            3. 风险因素
-            4. 投资策略建议
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一位资深的市场分析师，提供专业的市场情绪和趋势分析。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1000
-            )
+            content = self._chat("你是一位资深的市场分析师，提供专业的市场情绪和趋势分析。", prompt,
+                                 temperature=0.3, max_tokens=1000)
             
             return {
                 "timestamp": datetime.now().isoformat(),
-                "analysis": response.choices[0].message.content,
+                "analysis": content,
                 "market_data_summary": market_data
             }
             
@@ -164,44 +435,48 @@ class AIAnalyzer:
         :return: 交易策略
         """
         try:
-            stock_data = data_provider.get_stock_data(symbol, period='daily', days=60)
+            stock_data = data_provider.get_stock_data(symbol, period='daily', days=STRATEGY_DAYS)
             if stock_data.empty:
                 return {"error": f"No data available for {symbol}"}
             
-            prompt = f"""
-            为股票 {symbol} 设计一个{strategy_type}类型的交易策略，基于以下数据：
-            
-            最近60个交易日数据：
-            {json.dumps(stock_data.tail(10).to_dict('records'), indent=2, default=str)}
+            # 发送最近60个交易日（数据不足时发送全部），超出token预算时减少K线数（指标只计算一次）
+            summary = self.prompts.indicator_summary(symbol, stock_data)
+
+            def build(rows: int) -> str:
+                return (f"为股票 {symbol} 设计一个{strategy_type}类型的交易策略，基于以下数据：\n\n"
+                        f"{self.prompts.stock_context(symbol, stock_data, rows, summary)}\n\n"
+                        "请提供：\n"
+                        "1. 策略逻辑和入场条件\n"
+                        "2. 出场条件和止损设置\n"
+                        "3. 风险管理措施\n"
+                        "4. 预期收益率和最大回撤\n"
+                        "5. 具体操作建议")
             
-            请提供：
-            1. 策略逻辑和入场条件
-            2. 出场条件和止损设置
-            3. 风险管理措施
-            4. 预期收益率和最大回撤
-            5. 具体操作建议
-            """
+            prompt = self.prompts.fit(build, STRATEGY_BARS)
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一位专业的量化交易策略师，设计实用有效的交易策略。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4,
-                max_tokens=1200
-            )
+            content = self._chat("你是一位专业的量化交易策略师，设计实用有效的交易策略。", prompt,
+                                 temperature=0.4, max_tokens=1200)
             
             return {
                 "symbol": symbol,
                 "strategy_type": strategy_type,
                 "timestamp": datetime.now().isoformat(),
-                "strategy": response.choices[0].message.content
+                "strategy": content
             }
             
         except Exception as e:
             logger.error(f"Error generating strategy for {symbol}: {str(e)}")
             return {"error": f"Strategy generation failed for {symbol}: {str(e)}"}
 
+def _create_llm_cache():
+    """按配置创建AI回复缓存，失败时不使用缓存"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    try:
+        return LLMCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+    except Exception as e:
+        logger.error(f"Error opening AI cache {LLM_CACHE_PATH}: {str(e)}")
+        return None
+
 # 全局AI分析器实例
-ai_analyzer = AIAnalyzer()
\ No newline at end of file
+ai_analyzer = AIAnalyzer(cache=_create_llm_cache())
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+AI分析缓存模块
+以模型、提示词和输入数据的哈希为键，把AI回复持久化到SQLite，相同请求在有效期内直接复用，不消耗token
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+
+def cache_key(model: str, messages: List[Dict], **params) -> str:
+    """
+    请求的缓存键
+    提示词中已经包含了输入数据，数据变化（如出现新的K线）时键随之变化
+    :param params: 影响回复的其他参数，如 temperature、max_tokens
+    """
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    磁盘缓存
+    - 超过 ttl 秒的条目视为过期，读取时删除
+    - 条目数超过 max_entries 时淘汰最久未使用的条目
+    """
+
+    def __init__(self, path: str, ttl: int = 43200, max_entries: int = 2000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.tokens_saved = 0
+
+    def get(self, key: str, now: float = None) -> Optional[str]:
+        """读取缓存的回复，未命中或已过期返回None"""
+        now = now or time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT content, tokens, created_at FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            content, tokens, created_at = row
+            if now - created_at >= self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.tokens_saved += tokens
+            return content
+
+    def put(self, key: str, model: str, content: str, tokens: int = 0, now: float = None):
+        """
+        写入回复
+        :param tokens: 本次请求消耗的token数，命中时计入节省的token
+        """
+        now = now or time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, tokens, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, model, content, tokens, now, now))
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (count - self.max_entries,))
+                self.evictions += count - self.max_entries
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        """缓存命中统计"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "tokens_saved": self.tokens_saved,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
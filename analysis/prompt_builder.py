@@ -0,0 +1,123 @@
+"""
+提示词构建模块
+把K线编码为紧凑的表格，附上预先计算的技术指标（与风险监控同一口径），并按token预算裁剪发送的K线数
+"""
+import math
+import logging
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from monitoring.indicators import IndicatorEngine
+
+logger = logging.getLogger(__name__)
+
+# 预算不足时最少保留的K线数
+MIN_BARS = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数（DeepSeek分词器约1个汉字0.6个token、1个英文字符0.3个token）
+    只用于切分批次和控制预算，不需要精确
+    """
+    cjk = sum(1 for char in text if ord(char) > 0x2E80)
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+def _number(value: float, digits: int = 2) -> str:
+    """去掉多余的0，NaN显示为-"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "-"
+    return f"{value:.{digits}f}".rstrip('0').rstrip('.')
+
+
+def encode_bars(bars: pd.DataFrame, rows: int) -> str:
+    """
+    把最近rows根K线编码为紧凑表格，表头只出现一次，日期省略年份，成交量以万为单位
+    :return: 首行为表头的多行文本
+    """
+    recent = bars.tail(rows)
+    if recent.empty:
+        return ""
+    start, end = recent.index[0], recent.index[-1]
+    lines = [f"日期({start.year}-{end.year}),开,高,低,收,量(万)" if start.year != end.year
+             else f"日期({end.year}),开,高,低,收,量(万)"]
+    for timestamp, row in recent.iterrows():
+        lines.append(",".join([
+            timestamp.strftime('%m-%d'),
+            _number(row['open']), _number(row['high']), _number(row['low']), _number(row['close']),
+            _number(row['volume'] / 10000, 1),
+        ]))
+    return "\n".join(lines)
+
+
+def compute_indicators(symbol: str, bars: pd.DataFrame) -> Optional[Dict[str, float]]:
+    """
+    用风险监控的流式指标计算最新K线的RSI、MACD、支撑/阻力位和量比
+    每次使用独立的状态，可以在多个线程中同时调用
+    """
+    if bars.empty:
+        return None
+    return IndicatorEngine().sync(symbol, bars)
+
+
+def summarize_indicators(indicators: Optional[Dict[str, float]]) -> str:
+    """指标摘要，单行文本"""
+    if not indicators:
+        return ""
+    return (f"RSI14 {_number(indicators['rsi'], 1)}；"
+            f"MACD {_number(indicators['macd'], 3)}，信号线 {_number(indicators['macd_signal'], 3)}，"
+            f"柱 {_number(indicators['macd_hist'], 3)}；"
+            f"30日支撑 {_number(indicators['support'])}，30日阻力 {_number(indicators['resistance'])}；"
+            f"20日最高 {_number(indicators['high_20'])}；10日均价 {_number(indicators['avg_price_10'])}；"
+            f"量比 {_number(indicators['volume_ratio'])}")
+
+
+class PromptBuilder:
+    """
+    提示词构建器
+    先按需要的K线数构建提示词，估算的token数超出预算时逐步减少K线数，最少保留 MIN_BARS 根
+    """
+
+    def __init__(self, token_budget: int = 2000):
+        self.token_budget = token_budget
+
+    def indicator_summary(self, symbol: str, bars: pd.DataFrame) -> str:
+        """指标摘要，与发送的K线数无关，在 fit 裁剪K线之前计算一次即可"""
+        return summarize_indicators(compute_indicators(symbol, bars))
+
+    def stock_context(self, symbol: str, bars: pd.DataFrame, rows: int, summary: str = None) -> str:
+        """
+        单只股票的数据段：最新价、指标摘要和最近rows根K线
+        :param summary: 预先计算的指标摘要（见 indicator_summary），为None时现场计算
+        """
+        latest = bars['close'].iloc[-1]
+        if summary is None:
+            summary = self.indicator_summary(symbol, bars)
+        lines = [f"最新收盘价 {_number(latest)}"]
+        if summary:
+            lines.append(f"技术指标：{summary}")
+        lines.append(f"最近{min(rows, len(bars))}个交易日K线：")
+        lines.append(encode_bars(bars, rows))
+        return "\n".join(lines)
+
+    def fit(self, build: Callable[[int], str], rows: int, budget: int = None) -> str:
+        """
+        按预算裁剪K线数
+        :param build: 按K线数构建提示词的函数（提示词中应包含系统提示词以外的全部内容），
+                      每次裁剪都会重新调用，指标摘要应在调用前算好
+        :param rows: 期望发送的K线数
+        :param budget: token预算，默认使用构建器的预算
+        :return: 不超过预算的提示词；K线减到 MIN_BARS 仍超出时返回该版本并记录警告
+        """
+        budget = budget or self.token_budget
+        while True:
+            prompt = build(rows)
+            tokens = estimate_tokens(prompt)
+            if tokens <= budget:
+                return prompt
+            if rows <= MIN_BARS:
+                logger.warning(f"Prompt uses ~{tokens} tokens, over the budget of {budget}")
+                return prompt
+            rows = max(MIN_BARS, int(rows * budget / tokens))
@@ -0,0 +1,233 @@
+"""
+指标与监控热点路径基准测试
+用确定性的合成K线（不访问网络）测试 RiskMonitor 各指标函数和完整 monitor_stocks 轮次在不同股票数下的耗时，
+结果保存为JSON，可与其他提交的结果对比
+
+python -m benchmarks.hot_paths --symbols 10,100,1000,5000 --output bench.json
+python -m benchmarks.hot_paths --compare bench.json
+"""
+import sys
+import time
+import json
+import platform
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data.replay import generate_synthetic_bars, synthetic_symbols
+from monitoring.risk_monitor import RiskMonitor, CycleDataContext, TECHNICAL_LOOKBACK_DAYS
+
+# 单只股票的指标函数，参数为收盘价序列
+INDICATOR_BENCHMARKS = {
+    'calculate_rsi': lambda monitor, prices: monitor.calculate_rsi(prices),
+    'calculate_macd': lambda monitor, prices: monitor.calculate_macd(prices),
+    'detect_breakout': lambda monitor, prices: monitor.detect_breakout(prices),
+    'detect_support_resistance': lambda monitor, prices: monitor.detect_support_resistance(prices),
+}
+
+# 结果比上次慢超过该比例时标记为退化
+REGRESSION_RATIO = 1.2
+
+# 固定的模拟时刻（交易日盘中），保证每次运行的数据窗口完全一致
+BENCHMARK_NOW = datetime(2024, 6, 28, 14, 30)
+
+
+class SyntheticProvider:
+    """
+    内存中的合成数据源，接口与 DataProvider 一致
+    全市场快照取每只股票最后一根K线，用于覆盖使用实时报价的路径
+    """
+
+    def __init__(self, frames, now: datetime, with_quotes: bool = True):
+        self.frames = frames
+        self._now = now
+        self.with_quotes = with_quotes
+
+    def now(self) -> datetime:
+        return self._now
+
+    def get_stock_data(self, symbol, period='daily', days=30):
+        frame = self.frames.get(symbol)
+        if frame is None:
+            return pd.DataFrame()
+        start = pd.Timestamp((self._now - timedelta(days=days)).date())
+        return frame[frame.index >= start].copy()
+
+    def get_stock_data_many(self, symbols, period='daily', days=30, max_workers=None):
+        for symbol in symbols:
+            yield symbol, self.get_stock_data(symbol, period, days)
+
+    def get_market_snapshot(self) -> pd.DataFrame:
+        if not self.with_quotes:
+            return pd.DataFrame()
+        rows = {}
+        for symbol, frame in self.frames.items():
+            last, prev = frame.iloc[-1], frame.iloc[-2]
+            rows[symbol] = {
+                'name': symbol, 'price': last['close'],
+                'change_pct': (last['close'] / prev['close'] - 1) * 100,
+                'open': last['open'], 'high': last['high'], 'low': last['low'], 'prev_close': prev['close'],
+                'volume': last['volume'], 'amount': last['amount'],
+            }
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def get_quotes(self, symbols):
+        snapshot = self.get_market_snapshot()
+        if snapshot.empty:
+            return {}
+        records = snapshot.to_dict('index')
+        return {symbol: records[symbol] for symbol in symbols if symbol in records}
+
+
+def _best_of(func, repeat: int) -> float:
+    """重复执行，取最快一次的耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bench_indicators(monitor: RiskMonitor, series, repeat: int) -> dict:
+    """对每只股票依次调用各指标函数"""
+    results = {}
+    for name, func in INDICATOR_BENCHMARKS.items():
+        seconds = _best_of(lambda: [func(monitor, prices) for prices in series], repeat)
+        results[name] = {'seconds': round(seconds, 6), 'per_symbol_us': round(seconds / len(series) * 1e6, 2)}
+    return results
+
+
+def bench_monitor_cycle(frames, now: datetime, repeat: int, with_quotes: bool) -> dict:
+    """
+    完整的 monitor_stocks 轮次
+    - cold: 新建的 RiskMonitor，流式指标需要从头计算
+    - warm: 同一个 RiskMonitor 的后续轮次，K线已同步，只更新实时报价
+    """
+    symbols = list(frames)
+    provider = SyntheticProvider(frames, now, with_quotes=with_quotes)
+
+    def cycle(monitor):
+        return monitor.monitor_stocks(symbols, CycleDataContext(provider))
+
+    cold_timings, alert_counts = [], []
+    for _ in range(repeat):
+        monitor = RiskMonitor(store=None)
+        started = time.perf_counter()
+        alert_counts.append(len(cycle(monitor)))
+        cold_timings.append(time.perf_counter() - started)
+
+    # 清空冷却记录，使每轮的警报处理量与冷启动一致
+    def warm_cycle():
+        monitor._last_fired.clear()
+        cycle(monitor)
+
+    warm = _best_of(warm_cycle, repeat)
+    return {
+        'cold_seconds': round(min(cold_timings), 6),
+        'warm_seconds': round(warm, 6),
+        'alerts': alert_counts[0],
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(sizes, repeat: int, days: int, with_quotes: bool = True, seed: int = 42) -> dict:
+    now = BENCHMARK_NOW
+    start = pd.Timestamp((now - timedelta(days=TECHNICAL_LOOKBACK_DAYS)).date())
+    monitor = RiskMonitor(store=None)
+
+    results = []
+    for size in sizes:
+        # 每组单独生成，同一股票数的数据与 --symbols 的其他取值无关
+        frames = generate_synthetic_bars(synthetic_symbols(size), days=days, end_date=now, seed=seed)
+        # 与监控一致，指标函数使用最近 TECHNICAL_LOOKBACK_DAYS 个自然日的收盘价
+        series = [frame.loc[frame.index >= start, 'close'] for frame in frames.values()]
+        indicators = bench_indicators(monitor, series, repeat)
+        cycle = bench_monitor_cycle(frames, now, repeat, with_quotes)
+        results.append({'symbols': size, 'indicators': indicators, 'monitor_stocks': cycle})
+
+        print(f"\n{size} 只股票")
+        for name, row in indicators.items():
+            print(f"  {name:<28}{row['seconds'] * 1000:10.1f} ms  {row['per_symbol_us']:9.1f} us/只")
+        print(f"  {'monitor_stocks (cold)':<28}{cycle['cold_seconds'] * 1000:10.1f} ms")
+        print(f"  {'monitor_stocks (warm)':<28}{cycle['warm_seconds'] * 1000:10.1f} ms  {cycle['alerts']} 个警报")
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'days': days,
+        'repeat': repeat,
+        'with_quotes': with_quotes,
+        'seed': seed,
+        'results': results,
+    }
+
+
+def _flatten(report: dict) -> dict:
+    """{(股票数, 测试项): 秒}"""
+    timings = {}
+    for row in report['results']:
+        for name, values in row['indicators'].items():
+            timings[(row['symbols'], name)] = values['seconds']
+        timings[(row['symbols'], 'monitor_stocks (cold)')] = row['monitor_stocks']['cold_seconds']
+        timings[(row['symbols'], 'monitor_stocks (warm)')] = row['monitor_stocks']['warm_seconds']
+    return timings
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_RATIO) -> list:
+    """
+    对比两次结果
+    :return: 退化的测试项列表 [(股票数, 测试项, 上次秒数, 本次秒数)]
+    """
+    before, after = _flatten(baseline), _flatten(current)
+    regressions = []
+    print(f"\n对比 {baseline.get('commit') or '-'} -> {current.get('commit') or '-'}")
+    for key in sorted(set(before) & set(after)):
+        ratio = after[key] / before[key] if before[key] else float('inf')
+        marker = '  <-- 退化' if ratio > threshold else ''
+        print(f"  {key[0]:>6} {key[1]:<28}{before[key] * 1000:10.1f} ms -> {after[key] * 1000:10.1f} ms"
+              f"  {ratio:5.2f}x{marker}")
+        if ratio > threshold:
+            regressions.append((key[0], key[1], before[key], after[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指标与监控热点路径基准测试")
+    parser.add_argument('--symbols', default='10,100,1000,5000', help='逗号分隔的股票数量')
+    parser.add_argument('--days', type=int, default=120, help='每只股票生成的交易日数')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最快一次')
+    parser.add_argument('--no-quotes', action='store_true', help='不提供实时报价，只用日K线')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径')
+    parser.add_argument('--compare', default=None, help='与之前保存的结果JSON对比，有退化时退出码为1')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_RATIO, help='视为退化的耗时倍数')
+    args = parser.parse_args()
+
+    sizes = [int(value) for value in args.symbols.split(',')]
+    report = run(sizes, args.repeat, args.days, with_quotes=not args.no_quotes)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
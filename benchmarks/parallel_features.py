@@ -0,0 +1,69 @@
+"""
+多进程指标计算基准测试
+用合成K线测试不同进程数下批量指标计算的耗时和加速比
+
+python -m benchmarks.parallel_features --symbols 5000 --rows 250 --workers 1,2,4,8
+"""
+import time
+import json
+import argparse
+
+import numpy as np
+
+from data.replay import generate_synthetic_bars, synthetic_symbols
+from monitoring.batch_scan import build_matrix, compute_features
+from monitoring.parallel_scan import FeaturePool
+
+
+def _same_features(expected, actual) -> bool:
+    return all(np.array_equal(expected[name], actual[name], equal_nan=True) for name in expected)
+
+
+def run(symbols: int, rows: int, workers_list, repeat: int, seed: int = 42) -> dict:
+    frames = generate_synthetic_bars(synthetic_symbols(symbols), days=rows, seed=seed)
+    _, close, volume = build_matrix(frames)
+    expected = compute_features(close, volume)
+
+    results = []
+    baseline = None
+    for workers in workers_list:
+        pool = FeaturePool(workers=workers, min_symbols=0)
+        try:
+            pool.compute(close, volume)  # 预热，启动子进程
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                features = pool.compute(close, volume)
+                timings.append(time.perf_counter() - started)
+            if not _same_features(expected, features):
+                raise AssertionError(f"{workers} 个进程的计算结果与单进程不一致")
+        finally:
+            pool.shutdown()
+
+        best = min(timings)
+        baseline = baseline or best
+        results.append({'workers': workers, 'seconds': round(best, 4), 'speedup': round(baseline / best, 2)})
+        print(f"workers={workers:<3} {best * 1000:9.1f} ms  speedup {baseline / best:5.2f}x")
+
+    return {'symbols': symbols, 'rows': rows, 'repeat': repeat, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程指标计算基准测试")
+    parser.add_argument('--symbols', type=int, default=5000, help='股票数量')
+    parser.add_argument('--rows', type=int, default=250, help='每只股票的K线数')
+    parser.add_argument('--workers', default='1,2,4,8', help='逗号分隔的进程数')
+    parser.add_argument('--repeat', type=int, default=5, help='每组重复次数，取最快一次')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径')
+    args = parser.parse_args()
+
+    workers_list = [int(value) for value in args.workers.split(',')]
+    print(f"{args.symbols} 只股票 x {args.rows} 根K线")
+    report = run(args.symbols, args.rows, workers_list, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,71 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")  # 或者 "deepseek-reasoner"
 
+# AI分析缓存配置（模型、提示词和数据都相同的请求直接复用之前的回复）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.db")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "43200"))  # 缓存有效期（秒）
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))  # 最大缓存条目数
+
+# AI调用并发配置
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))  # 同时在途的AI请求上限
+AI_CALL_TIMEOUT = float(os.getenv("AI_CALL_TIMEOUT", "60"))  # 单次AI请求超时（秒）
+AI_STREAM_TIMEOUT = float(os.getenv("AI_STREAM_TIMEOUT", "120"))  # 流式AI回复的总时长上限（秒），超出后断开
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "1500"))  # 单股分析和策略生成的提示词token预算
+AI_BATCH_TOKEN_BUDGET = int(os.getenv("AI_BATCH_TOKEN_BUDGET", "12000"))  # 批量分析单次请求的token预算（输入加输出）
+AI_BATCH_MAX_SYMBOLS = int(os.getenv("AI_BATCH_MAX_SYMBOLS", "10"))  # 批量分析每次请求最多包含的股票数
+
 # 数据源配置
-DATA_SOURCE = os.getenv("DATA_SOURCE", "ashare")  # ashare, tushare, akshare
+DATA_SOURCE = os.getenv("DATA_SOURCE", "ashare")  # ashare, tushare, akshare, replay
+
+# 回放数据源配置（DATA_SOURCE=replay 时生效，用于离线压测）
+REPLAY_DATA_DIR = os.getenv("REPLAY_DATA_DIR", "data/replay")
+REPLAY_START = os.getenv("REPLAY_START")  # 模拟时钟起点，如 2024-06-03T09:30:00，默认当前时间
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))  # 模拟时钟倍速
+
+# 本地K线存储配置（历史K线持久化，后续只做增量拉取）
+BAR_STORE_ENABLED = os.getenv("BAR_STORE_ENABLED", "true").lower() == "true"
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", "data/bars")
+
+# 行情缓存配置
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))  # 最大缓存条目数
+CACHE_INTRADAY_TTL = int(os.getenv("CACHE_INTRADAY_TTL", "60"))  # 交易时段内缓存秒数
+CACHE_SETTLE_MINUTES = int(os.getenv("CACHE_SETTLE_MINUTES", "15"))  # 收盘后数据修正窗口（分钟）
+
+# 并发拉取配置
+DATA_FETCH_WORKERS = int(os.getenv("DATA_FETCH_WORKERS", "8"))  # 多股票并发拉取线程数
+DATA_SOURCE_MAX_CONCURRENCY = int(os.getenv("DATA_SOURCE_MAX_CONCURRENCY", "4"))  # 单个数据源的并发请求上限
+
+# 数据源限流、重试和熔断配置
+SOURCE_RATE_LIMIT = float(os.getenv("SOURCE_RATE_LIMIT", "5"))  # 每秒请求数
+SOURCE_RATE_BURST = int(os.getenv("SOURCE_RATE_BURST", "10"))  # 允许的突发请求数
+SOURCE_MAX_RETRIES = int(os.getenv("SOURCE_MAX_RETRIES", "3"))  # 失败重试次数
+SOURCE_RETRY_BASE_DELAY = float(os.getenv("SOURCE_RETRY_BASE_DELAY", "0.5"))  # 退避基础秒数
+SOURCE_RETRY_MAX_DELAY = float(os.getenv("SOURCE_RETRY_MAX_DELAY", "8"))  # 单次退避最大秒数
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # 连续失败多少次后熔断
+CIRCUIT_RECOVERY_SECONDS = int(os.getenv("CIRCUIT_RECOVERY_SECONDS", "60"))  # 熔断后多久尝试恢复
+
+# 批量扫描配置（监控股票数达到阈值时改用矩阵化批量计算）
+BATCH_SCAN_MIN_SYMBOLS = int(os.getenv("BATCH_SCAN_MIN_SYMBOLS", "50"))
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "1"))  # 指标计算进程数，1为不启用多进程，0为CPU核数
+PROCESS_POOL_MIN_SYMBOLS = int(os.getenv("PROCESS_POOL_MIN_SYMBOLS", "2000"))  # 股票数达到多少时启用多进程
+
+# 警报配置
+ALERT_COOLDOWN_SECONDS = int(os.getenv("ALERT_COOLDOWN_SECONDS", "300"))  # 同一股票同类警报的静默时间（秒）
+ALERT_HISTORY_SIZE = int(os.getenv("ALERT_HISTORY_SIZE", "1000"))  # 内存中保留的最近警报条数
+ALERT_STORE_ENABLED = os.getenv("ALERT_STORE_ENABLED", "true").lower() == "true"  # 是否持久化警报
+ALERT_STORE_PATH = os.getenv("ALERT_STORE_PATH", "data/alerts.db")
+
+# 盘中监控轮询间隔（秒），根据行情活跃度在两者之间自动调整
+MONITOR_MIN_INTERVAL = float(os.getenv("MONITOR_MIN_INTERVAL", "60"))
+MONITOR_MAX_INTERVAL = float(os.getenv("MONITOR_MAX_INTERVAL", "300"))
+
+# 全市场扫描配置
+MARKET_SCAN_INTERVAL = int(os.getenv("MARKET_SCAN_INTERVAL", "300"))  # 扫描间隔（秒）
+MARKET_SCAN_CYCLE_TARGET = float(os.getenv("MARKET_SCAN_CYCLE_TARGET", "30"))  # 单轮扫描耗时目标（秒）
+MARKET_SCAN_FETCH_LIMIT = int(os.getenv("MARKET_SCAN_FETCH_LIMIT", "100"))  # 本地没有历史时每轮最多逐只拉取的股票数
+MARKET_SCAN_HISTORY_RETRIES = int(os.getenv("MARKET_SCAN_HISTORY_RETRIES", "3"))  # 历史K线获取失败的股票每天最多重试次数
 
 # 监控股票列表
 WATCHLIST = [
@@ -28,6 +91,14 @@ RSI_OVERBOUGHT = 70  # RSI超买线
 RSI_OVERSOLD = 30    # RSI超卖线
 STOP_LOSS_PERCENT = 5.0  # 止损百分比
 TAKE_PROFIT_PERCENT = 10.0  # 止盈百分比
+PRICE_ALERT_PERCENT = 2.0  # 偏离10日均价多少百分比触发价格异动
+PRICE_ALERT_HIGH_PERCENT = 5.0  # 价格异动达到多少百分比为高风险
+VOLUME_RATIO_THRESHOLD = 2.0  # 成交量达到10日均量的多少倍触发放量
+BREAKOUT_FACTOR = 0.995  # 收盘价超过20日最高价的多少倍视为突破
+SUPPORT_RESISTANCE_PROXIMITY = 0.02  # 距支撑/阻力位多近视为接近
+
+# 警报规则文件（JSON），不存在时使用由上述策略参数生成的默认规则
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", "config/alert_rules.json")
 
 # 通知配置
 NOTIFICATION_CHANNELS = {
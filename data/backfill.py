@@ -0,0 +1,164 @@
+"""
+历史数据回补模块
+并发下载多年日K线到本地K线存储，支持断点续传
+"""
+import os
+import json
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+import akshare as ak
+
+from config.settings import WATCHLIST, DATA_SOURCE, BAR_STORE_DIR, DATA_FETCH_WORKERS
+from config.stocks_example import EXAMPLE_WATCHLIST
+from data.data_provider import data_provider, code_to_symbol
+
+logger = logging.getLogger(__name__)
+
+# 每完成多少只股票保存一次断点
+CHECKPOINT_EVERY = 20
+
+
+def load_universe(name: str) -> List[str]:
+    """
+    获取回补的股票池
+    :param name: watchlist（当前监控列表）、example（示例列表）、all（全部A股）或逗号分隔的股票代码
+    """
+    if name == 'watchlist':
+        return list(WATCHLIST)
+    if name == 'example':
+        return list(EXAMPLE_WATCHLIST)
+    if name == 'all':
+        codes = ak.stock_info_a_code_name()['code']
+        return [code_to_symbol(str(code).zfill(6)) for code in codes]
+    return [symbol.strip() for symbol in name.split(',') if symbol.strip()]
+
+
+class BackfillCheckpoint:
+    """
+    回补断点，记录已完成和失败的股票，以及批量模式下已完成的日期
+    断点只对相同的回补年数有效，年数变化时从头开始
+    """
+
+    def __init__(self, path: str, years: int):
+        self.path = path
+        self.years = years
+        self.done = set()
+        self.failed = set()
+        self.bulk_through = None
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('years') != years:
+                logger.info(f"断点的回补年数为 {state.get('years')}，本次为 {years}，忽略已有断点")
+                return
+            self.done = set(state.get('done', []))
+            self.failed = set(state.get('failed', []))
+            self.bulk_through = state.get('bulk_through')
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'years': self.years,
+                'done': sorted(self.done),
+                'failed': sorted(self.failed),
+                'bulk_through': self.bulk_through,
+                'updated_at': datetime.now().isoformat()
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def backfill_symbols(symbols: List[str], years: int, workers: int, checkpoint: BackfillCheckpoint) -> dict:
+    """
+    按股票并发回补
+    已完成的股票直接跳过；本地已有的历史只会增量补齐
+    以本地K线存储的覆盖区间判断是否完成：数据源失败时返回的本地旧数据不够长，不算完成，下次继续重试
+    """
+    start_date = (data_provider.now() - timedelta(days=years * 365)).date()
+    pending = [symbol for symbol in symbols if symbol not in checkpoint.done]
+    logger.info(f"回补 {len(symbols)} 只股票，已完成 {len(symbols) - len(pending)} 只，待处理 {len(pending)} 只")
+
+    started = time.time()
+    total_bars = 0
+    for i, (symbol, df) in enumerate(data_provider.get_stock_data_many(pending, period='daily', days=years * 365,
+                                                                        max_workers=workers), 1):
+        coverage = data_provider.bar_store.coverage(symbol, 'daily')
+        if coverage and coverage[0] <= start_date:
+            checkpoint.done.add(symbol)
+            checkpoint.failed.discard(symbol)
+            total_bars += len(df)
+        else:
+            checkpoint.failed.add(symbol)
+
+        if i % CHECKPOINT_EVERY == 0 or i == len(pending):
+            checkpoint.save()
+            elapsed = time.time() - started
+            logger.info(f"进度 {i}/{len(pending)}，{total_bars} 根K线，{total_bars / elapsed:.0f} 根/秒")
+
+    elapsed = time.time() - started
+    return {
+        'symbols': len(pending),
+        'failed': len(checkpoint.failed),
+        'bars': total_bars,
+        'seconds': round(elapsed, 1),
+        'bars_per_second': round(total_bars / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def backfill_bulk(years: int, checkpoint: BackfillCheckpoint) -> dict:
+    """tushare按交易日批量回补全市场，从断点日期之后继续"""
+    start_date = datetime.now() - timedelta(days=years * 365)
+    if checkpoint.bulk_through:
+        start_date = max(start_date, datetime.fromisoformat(checkpoint.bulk_through) + timedelta(days=1))
+
+    started = time.time()
+
+    def on_progress(done_dates, total_dates, bars, completed_through):
+        checkpoint.bulk_through = completed_through.isoformat()
+        checkpoint.save()
+        elapsed = time.time() - started
+        logger.info(f"进度 {done_dates}/{total_dates} 个交易日，{bars} 根K线，{bars / elapsed:.0f} 根/秒")
+
+    total_bars = data_provider.bulk_update_tushare(start_date, progress=on_progress)
+    elapsed = time.time() - started
+    return {
+        'bars': total_bars,
+        'seconds': round(elapsed, 1),
+        'bars_per_second': round(total_bars / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py backfill', description="回补历史日K线到本地K线存储")
+    parser.add_argument('--universe', default='watchlist',
+                        help='股票池：watchlist、example、all，或逗号分隔的股票代码')
+    parser.add_argument('--years', type=int, default=3, help='回补年数')
+    parser.add_argument('--workers', type=int, default=DATA_FETCH_WORKERS, help='并发线程数')
+    parser.add_argument('--checkpoint', default=None, help='断点文件路径')
+    parser.add_argument('--restart', action='store_true', help='忽略已有断点，重新开始')
+    parser.add_argument('--bulk', action='store_true', help='按交易日批量下载全市场（仅tushare数据源）')
+    args = parser.parse_args(argv)
+
+    if data_provider.bar_store is None:
+        parser.error("回补需要启用本地K线存储（BAR_STORE_ENABLED=true）")
+    if args.bulk and DATA_SOURCE != 'tushare':
+        parser.error("--bulk 仅支持 DATA_SOURCE=tushare")
+
+    mode = 'bulk' if args.bulk else args.universe.replace(',', '_')[:40]
+    checkpoint_path = args.checkpoint or os.path.join(BAR_STORE_DIR, f"backfill_{mode}.json")
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = BackfillCheckpoint(checkpoint_path, args.years)
+
+    if args.bulk:
+        result = backfill_bulk(args.years, checkpoint)
+    else:
+        result = backfill_symbols(load_universe(args.universe), args.years, args.workers, checkpoint)
+
+    logger.info(f"回补完成: {result}")
+    return result
@@ -0,0 +1,151 @@
+"""
+本地K线存储模块
+按股票代码和周期将OHLCV数据以Parquet列式文件持久化，支持增量追加
+"""
+import os
+import json
+import threading
+import logging
+from datetime import datetime, date, timedelta
+from typing import Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class BarStore:
+    """
+    每个 (周期, 股票代码) 对应一个Parquet文件和一个JSON元数据文件。
+    元数据记录已覆盖的日期区间：
+    - start: 已从数据源拉取过的最早日期（即使当天没有K线也算覆盖）
+    - complete_through: 该日期及之前的K线已收盘定型，不会再变化
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol: str, period: str) -> threading.Lock:
+        key = (symbol, period)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _data_path(self, symbol: str, period: str) -> str:
+        return os.path.join(self.root_dir, period, f"{symbol}.parquet")
+
+    def _meta_path(self, symbol: str, period: str) -> str:
+        return os.path.join(self.root_dir, period, f"{symbol}.json")
+
+    def _read_meta(self, symbol: str, period: str) -> Optional[dict]:
+        path = self._meta_path(symbol, period)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取K线元数据失败 {path}: {str(e)}")
+            return None
+
+    def coverage(self, symbol: str, period: str) -> Optional[Tuple[date, date]]:
+        """
+        获取已覆盖区间
+        :return: (start, complete_through)，无记录时返回None
+        """
+        meta = self._read_meta(symbol, period)
+        if not meta:
+            return None
+        return (date.fromisoformat(meta['start']),
+                date.fromisoformat(meta['complete_through']))
+
+    def last_bar(self, symbol: str, period: str) -> Optional[pd.Timestamp]:
+        """获取已存储的最后一根K线的时间"""
+        meta = self._read_meta(symbol, period)
+        if not meta or not meta.get('last_bar'):
+            return None
+        return pd.Timestamp(meta['last_bar'])
+
+    def load(self, symbol: str, period: str, start=None, end=None) -> pd.DataFrame:
+        """
+        读取本地K线
+        :param start: 起始时间（含），None表示不限制
+        :param end: 结束时间（含），None表示不限制
+        :return: 以日期为索引、按时间升序的DataFrame
+        """
+        path = self._data_path(symbol, period)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+
+        df = pd.read_parquet(path)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index <= pd.Timestamp(end)]
+        return df
+
+    def append(self, symbol: str, period: str, bars: pd.DataFrame,
+               start: date, complete_through: date):
+        """
+        合并新K线并更新覆盖区间
+        同一时间戳以新数据为准，覆盖区间与已有区间合并（见 _merge_coverage）；
+        start 晚于 complete_through 时只写入K线，不更新覆盖区间
+        :param bars: 以日期为索引的新K线，可以为空（仅推进覆盖区间）
+        :param start: 本次拉取的起始日期
+        :param complete_through: 本次拉取后已定型的最后日期
+        """
+        with self._lock(symbol, period):
+            os.makedirs(os.path.join(self.root_dir, period), exist_ok=True)
+
+            meta = self._read_meta(symbol, period)
+            last_bar = meta.get('last_bar') if meta else None
+
+            if bars is not None and not bars.empty:
+                existing = self.load(symbol, period)
+                merged = pd.concat([existing, bars]) if not existing.empty else bars
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                self._atomic_write_parquet(self._data_path(symbol, period), merged)
+                last_bar = merged.index[-1].isoformat()
+
+            if start > complete_through:
+                # 只拉取了尚未定型的K线（如盘中拉取当天），覆盖区间不变
+                if not meta:
+                    return
+                start, complete_through = (date.fromisoformat(meta['start']),
+                                           date.fromisoformat(meta['complete_through']))
+            elif meta:
+                start, complete_through = self._merge_coverage(
+                    (date.fromisoformat(meta['start']), date.fromisoformat(meta['complete_through'])),
+                    (start, complete_through))
+
+            self._atomic_write_json(self._meta_path(symbol, period), {
+                'start': start.isoformat(),
+                'complete_through': complete_through.isoformat(),
+                'last_bar': last_bar,
+                'updated_at': datetime.now().isoformat()
+            })
+
+    @staticmethod
+    def _merge_coverage(existing: Tuple[date, date], new: Tuple[date, date]) -> Tuple[date, date]:
+        """
+        合并覆盖区间
+        两个区间相交或相邻时取并集；中间有空档时保留结束较晚的区间，空档部分之后会重新拉取
+        """
+        one_day = timedelta(days=1)
+        if new[0] <= existing[1] + one_day and existing[0] <= new[1] + one_day:
+            return min(existing[0], new[0]), max(existing[1], new[1])
+        return new if new[1] > existing[1] else existing
+
+    def _atomic_write_parquet(self, path: str, df: pd.DataFrame):
+        tmp_path = f"{path}.tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _atomic_write_json(self, path: str, payload: dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
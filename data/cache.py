@@ -0,0 +1,107 @@
+"""
+行情数据缓存模块
+进程内LRU缓存，按A股交易时段决定缓存有效期
+"""
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from data.trading_calendar import TradingCalendar, trading_calendar
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataCache:
+    """
+    交易日历感知的LRU缓存
+    - 交易时段内：当前K线仍在变化，使用较短的TTL
+    - 收盘后的结算窗口内：数据源可能仍在修正当日K线，同样使用短TTL
+    - 其余时间（午休、盘后、周末、节假日）：数据不会变化，缓存到下一个交易时段开始
+    """
+
+    def __init__(self, max_entries: int = 512, intraday_ttl: int = 60, settle_minutes: int = 15,
+                 calendar: TradingCalendar = None):
+        self.max_entries = max_entries
+        self.intraday_ttl = intraday_ttl
+        self.settle_minutes = settle_minutes
+        self.calendar = calendar or trading_calendar
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def expires_at(self, now: datetime) -> datetime:
+        """根据当前时间计算缓存过期时间"""
+        short_expiry = now + timedelta(seconds=self.intraday_ttl)
+        if self.calendar.is_trading_session(now):
+            return short_expiry
+
+        if self.calendar.is_trading_day(now.date()):
+            close_time = datetime.combine(now.date(), self.calendar.session_close)
+            if close_time <= now < close_time + timedelta(minutes=self.settle_minutes):
+                return short_expiry
+
+        return self.calendar.next_session_start(now)
+
+    def get(self, key, now: datetime = None) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回None"""
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, now: datetime = None, ttl: int = None):
+        """
+        写入缓存
+        :param ttl: 指定有效期（秒），为空时按交易时段计算
+        """
+        now = now or datetime.now()
+        expires_at = now + timedelta(seconds=ttl) if ttl is not None else self.expires_at(now)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """删除单个缓存项"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -6,48 +6,402 @@ import pandas as pd
 import akshare as ak
 import tushare as ts
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import logging
 
-from config.settings import DATA_SOURCE, DEEPSEEK_API_KEY
+from config.settings import (DATA_SOURCE, DEEPSEEK_API_KEY,
+                             BAR_STORE_ENABLED, BAR_STORE_DIR,
+                             CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_INTRADAY_TTL, CACHE_SETTLE_MINUTES,
+                             DATA_FETCH_WORKERS, DATA_SOURCE_MAX_CONCURRENCY,
+                             SOURCE_RATE_LIMIT, SOURCE_RATE_BURST, SOURCE_MAX_RETRIES,
+                             SOURCE_RETRY_BASE_DELAY, SOURCE_RETRY_MAX_DELAY,
+                             CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RECOVERY_SECONDS,
+                             REPLAY_DATA_DIR, REPLAY_START, REPLAY_SPEED)
+from data.bar_store import BarStore
+from data.cache import MarketDataCache
+from data.resilience import SourceGuard
+from data.intraday import MINUTE_PERIODS, aggregate_bars
+from data.replay import ReplaySource, SimulatedClock
+from data.trading_calendar import trading_calendar
 
 logger = logging.getLogger(__name__)
 
+# 分钟K线列名映射
+MINUTE_COLUMNS = {
+    '时间': 'datetime',
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount'
+}
+
+# 批量下载时内存中累积多少行K线后写入本地存储（全市场约400个交易日）
+BULK_FLUSH_ROWS = 2_000_000
+
+# 全市场快照列名映射
+SNAPSHOT_COLUMNS = {
+    '代码': 'code',
+    '名称': 'name',
+    '最新价': 'price',
+    '涨跌幅': 'change_pct',
+    '今开': 'open',
+    '最高': 'high',
+    '最低': 'low',
+    '昨收': 'prev_close',
+    '成交量': 'volume',
+    '成交额': 'amount'
+}
+
+def symbol_to_code(symbol):
+    """将 600519.XSHG / 600519SH 等格式转换为6位代码"""
+    for suffix in ('.XSHG', '.XSHE', '.SH', '.SZ', 'SH', 'SZ'):
+        if symbol.endswith(suffix):
+            return symbol[:-len(suffix)]
+    return symbol
+
+def code_to_symbol(code):
+    """6位代码转换为带交易所后缀的代码（与akshare一致，6开头为上交所，其余按深交所处理）"""
+    return f"{code}.XSHG" if code.startswith('6') else f"{code}.XSHE"
+
+def normalize_symbol(symbol):
+    """
+    统一为 600519.XSHG 格式，保留原有的交易所后缀（指数 000001.XSHG 不会变成平安银行 000001.XSHE）
+    不带后缀的6位代码按股票处理（见 code_to_symbol）
+    """
+    for suffix, exchange in (('.XSHG', '.XSHG'), ('.XSHE', '.XSHE'), ('.SH', '.XSHG'), ('.SZ', '.XSHE'),
+                             ('SH', '.XSHG'), ('SZ', '.XSHE')):
+        if symbol.endswith(suffix):
+            return symbol[:-len(suffix)] + exchange
+    return code_to_symbol(symbol)
+
 class DataProvider:
     def __init__(self):
         # 初始化tushare
         if hasattr(ts, 'set_token'):
             ts.set_token('your_tushare_token_here')  # 如果使用tushare
+
+        # 本地K线存储，历史K线只下载一次
+        self.bar_store = BarStore(BAR_STORE_DIR) if BAR_STORE_ENABLED else None
+
+        # 进程内行情缓存，Web界面、AI分析和风险监控共享
+        self.cache = MarketDataCache(
+            max_entries=CACHE_MAX_ENTRIES,
+            intraday_ttl=CACHE_INTRADAY_TTL,
+            settle_minutes=CACHE_SETTLE_MINUTES,
+            calendar=trading_calendar
+        ) if CACHE_ENABLED else None
+
+        # 每个上游数据源的并发上限，避免并发拉取时被限流
+        self._source_semaphores = {
+            'akshare': threading.BoundedSemaphore(DATA_SOURCE_MAX_CONCURRENCY),
+            'tushare': threading.BoundedSemaphore(DATA_SOURCE_MAX_CONCURRENCY),
+        }
+
+        # 每个上游数据源的限流、重试和熔断（并发上限在请求期间占用，退避等待时释放）
+        self._source_guards = {
+            name: SourceGuard(
+                name,
+                rate=SOURCE_RATE_LIMIT,
+                burst=SOURCE_RATE_BURST,
+                max_retries=SOURCE_MAX_RETRIES,
+                base_delay=SOURCE_RETRY_BASE_DELAY,
+                max_delay=SOURCE_RETRY_MAX_DELAY,
+                failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=CIRCUIT_RECOVERY_SECONDS,
+                semaphore=semaphore
+            )
+            for name, semaphore in self._source_semaphores.items()
+        }
+
+        # tushare客户端只创建一次，所有请求复用
+        self._pro = None
+        self._pro_lock = threading.Lock()
+
+        # 回放模式：从本地文件按模拟时钟提供数据，数据已在本地，不需要K线存储和缓存
+        self.replay = None
+        if DATA_SOURCE == 'replay':
+            start = datetime.fromisoformat(REPLAY_START) if REPLAY_START else None
+            self.replay = ReplaySource(REPLAY_DATA_DIR, SimulatedClock(start, REPLAY_SPEED))
+            self.bar_store = None
+            self.cache = None
+
+    def now(self):
+        """数据时钟：回放模式下为模拟时钟，否则为系统时间"""
+        if self.replay is not None:
+            return self.replay.clock.now()
+        return datetime.now()
         
     def get_stock_data(self, symbol, period='daily', days=30):
         """
         获取股票数据
+        先查进程内缓存，再读取本地K线存储，只向数据源增量拉取最后一根已定型K线之后的数据
+        分钟周期只拉取1分钟K线，其余分钟周期在本地聚合
         :param symbol: 股票代码
         :param period: 时间周期 ('daily', 'weekly', 'monthly', '1min', '5min', '15min', '30min', '60min')
         :param days: 获取天数
         :return: DataFrame
         """
+        cache_key = (symbol, period, days)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached.copy()
+
+        end_date = self.now()
+        start_date = end_date - timedelta(days=days)
         try:
-            if DATA_SOURCE == 'ashare':
-                return self._get_ashare_data(symbol, period, days)
-            elif DATA_SOURCE == 'akshare':
-                return self._get_akshare_data(symbol, period, days)
-            elif DATA_SOURCE == 'tushare':
-                return self._get_tushare_data(symbol, period, days)
+            if self.replay is not None:
+                df = self.replay.get_bars(symbol, period, start_date, end_date)
+            elif period in MINUTE_PERIODS:
+                df = self._get_intraday_data(symbol, period, start_date, end_date)
+            elif self.bar_store is None:
+                df = self._fetch_data(symbol, period, start_date, end_date)
             else:
-                # 默认使用akshare
-                return self._get_akshare_data(symbol, period, days)
+                df = self._get_stored_data(symbol, period, start_date, end_date)
+
+            if self.cache is not None and not df.empty:
+                self.cache.put(cache_key, df.copy(), now=end_date)
+            return df
         except Exception as e:
             logger.error(f"Error getting data for {symbol}: {str(e)}")
-            # 返回一个空的DataFrame作为fallback
-            import pandas as pd
+            return self._stale_fallback(symbol, period, start_date, end_date)
+
+    def _stale_fallback(self, symbol, period, start_date, end_date):
+        """数据源不可用时返回本地已存储的K线，没有时返回空DataFrame"""
+        if self.bar_store is not None:
+            try:
+                if period in MINUTE_PERIODS:
+                    df = aggregate_bars(self.bar_store.load(symbol, '1min', start=start_date, end=end_date), period)
+                else:
+                    df = self.bar_store.load(symbol, period, start=start_date.date(), end=end_date)
+                if not df.empty:
+                    logger.warning(f"数据源不可用，{symbol} 使用本地存储的K线（截至 {df.index[-1]}）")
+                    return df
+            except Exception as e:
+                logger.error(f"Error loading stored bars for {symbol}: {str(e)}")
+        # 返回一个空的DataFrame作为fallback
+        return pd.DataFrame()
+
+    def _get_stored_data(self, symbol, period, start_date, end_date):
+        """通过本地K线存储获取数据，缺失部分向数据源补齐"""
+        coverage = self.bar_store.coverage(symbol, period)
+
+        if coverage and coverage[0] <= start_date.date():
+            # 已有完整历史，只拉取未定型部分
+            fetch_start = datetime.combine(coverage[1] + timedelta(days=1), datetime.min.time())
+        else:
+            # 无本地数据或本地历史不够长，拉取整个区间
+            fetch_start = start_date
+
+        # 区间内没有交易日（周末、节假日）时无需请求数据源
+        if fetch_start.date() <= end_date.date():
+            if trading_calendar.has_trading_day(fetch_start.date(), end_date.date()):
+                bars = self._fetch_data(symbol, period, fetch_start, end_date)
+            else:
+                bars = pd.DataFrame()
+            self.bar_store.append(symbol, period, bars,
+                                  start=fetch_start.date(),
+                                  complete_through=self._complete_through(end_date))
+
+        return self.bar_store.load(symbol, period, start=start_date.date(), end=end_date)
+
+    def _get_intraday_data(self, symbol, period, start_date, end_date):
+        """
+        获取分钟K线
+        只存储和增量拉取1分钟K线，其余分钟周期在本地聚合
+        """
+        if self.bar_store is None:
+            bars = self._fetch_minute_data(symbol, start_date, end_date)
+            return aggregate_bars(bars, period)
+
+        coverage = self.bar_store.coverage(symbol, '1min')
+        last_bar = self.bar_store.last_bar(symbol, '1min')
+
+        fetch_start = start_date
+        if coverage and coverage[0] <= start_date.date():
+            # 从最后一根已存K线开始拉取，这根K线可能尚未走完，需要覆盖
+            fetch_start = datetime.combine(coverage[1] + timedelta(days=1), datetime.min.time())
+            if last_bar is not None and last_bar.to_pydatetime() > fetch_start:
+                fetch_start = last_bar.to_pydatetime()
+
+        if fetch_start <= end_date and trading_calendar.has_trading_day(fetch_start.date(), end_date.date()):
+            bars = self._fetch_minute_data(symbol, fetch_start, end_date)
+        else:
+            bars = pd.DataFrame()
+        self.bar_store.append(symbol, '1min', bars,
+                              start=fetch_start.date(),
+                              complete_through=self._complete_through(end_date))
+
+        bars = self.bar_store.load(symbol, '1min', start=start_date, end=end_date)
+        return aggregate_bars(bars, period)
+
+    def _fetch_minute_data(self, symbol, start_date, end_date):
+        """拉取1分钟K线，经过并发上限、限流、重试和熔断保护"""
+        source = self._source_name()
+        if source == 'tushare':
+            return self._source_guards[source].call(self._get_tushare_minute_data, symbol, start_date, end_date)
+        return self._source_guards[source].call(self._get_akshare_minute_data, symbol, start_date, end_date)
+
+    def _get_akshare_minute_data(self, symbol, start_date, end_date):
+        """使用akshare获取1分钟K线（东方财富只提供最近5个交易日）"""
+        df = ak.stock_zh_a_hist_min_em(
+            symbol=symbol_to_code(symbol),
+            start_date=start_date.strftime('%Y-%m-%d %H:%M:%S'),
+            end_date=end_date.strftime('%Y-%m-%d %H:%M:%S'),
+            period='1',
+            adjust=''
+        )
+
+        if not df.empty:
+            df = df.rename(columns=MINUTE_COLUMNS)[list(MINUTE_COLUMNS.values())]
+            df['datetime'] = pd.to_datetime(df['datetime'])
+            df.set_index('datetime', inplace=True)
+
+        return df
+
+    def _get_tushare_minute_data(self, symbol, start_date, end_date):
+        """使用tushare获取1分钟K线（需要分钟数据权限）"""
+        ts_symbol = symbol.replace('.XSHG', '.SH').replace('.XSHE', '.SZ')
+        df = ts.pro_bar(ts_code=ts_symbol, freq='1min', api=self._get_pro_client(),
+                        start_date=start_date.strftime('%Y-%m-%d %H:%M:%S'),
+                        end_date=end_date.strftime('%Y-%m-%d %H:%M:%S'))
+
+        if df is None:
             return pd.DataFrame()
+        if not df.empty:
+            df['trade_time'] = pd.to_datetime(df['trade_time'])
+            df = df.rename(columns={'trade_time': 'datetime', 'vol': 'volume'})
+            df = df.set_index('datetime').sort_index()[['open', 'close', 'high', 'low', 'volume', 'amount']]
+
+        return df
+
+    def _complete_through(self, now):
+        """当日K线收盘（或非交易日）后定型，否则只到前一日"""
+        if trading_calendar.is_day_complete(now.date(), now):
+            return now.date()
+        return now.date() - timedelta(days=1)
+
+    def get_cache_stats(self):
+        """获取缓存命中统计"""
+        if self.cache is None:
+            return {"enabled": False}
+        return dict(self.cache.stats(), enabled=True)
+
+    def get_stock_data_many(self, symbols, period='daily', days=30, max_workers=None):
+        """
+        并发获取多只股票数据
+        :param symbols: 股票代码列表
+        :param period: 时间周期
+        :param days: 获取天数
+        :param max_workers: 线程数，默认使用 DATA_FETCH_WORKERS
+        :return: 按完成顺序产出 (symbol, DataFrame) 的生成器，获取失败的股票产出空DataFrame
+        """
+        symbols = list(symbols)
+        if not symbols:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(max_workers or DATA_FETCH_WORKERS, len(symbols)))
+        try:
+            futures = {executor.submit(self.get_stock_data, symbol, period, days): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_daily_history(self, symbols, start_date, end_date, fetch_limit=None):
+        """
+        获取多只股票已走完的日K线（start_date 到 end_date 之前一天）
+        先读取本地K线存储；本地缺失或过期的股票，tushare数据源按交易日批量补齐，
+        其他数据源逐只拉取，每次最多 fetch_limit 只（回放数据不限制）
+        :param start_date: 起始日期（含）
+        :param end_date: 结束日期（不含），通常为今天
+        :param fetch_limit: 最多逐只拉取的股票数，None表示不限制
+        :return: {symbol: DataFrame}，获取失败的股票为空DataFrame，本次未拉取的股票不在结果中
+        """
+        frames = self._stored_daily_history(symbols, start_date, end_date)
+        missing = [symbol for symbol in symbols if symbol not in frames]
+
+        if missing and self.bar_store is not None and DATA_SOURCE == 'tushare':
+            # 从缺失最早的日期开始批量补齐，请求数只与交易日数有关
+            bulk_start = end_date
+            for symbol in missing:
+                coverage = self.bar_store.coverage(symbol, 'daily')
+                if coverage is None or coverage[0] > start_date:
+                    bulk_start = start_date
+                    break
+                bulk_start = min(bulk_start, coverage[1] + timedelta(days=1))
+            try:
+                self.bulk_update_tushare(datetime.combine(bulk_start, datetime.min.time()))
+                frames.update(self._stored_daily_history(missing, start_date, end_date))
+                missing = [symbol for symbol in missing if symbol not in frames]
+            except Exception as e:
+                logger.error(f"Error bulk updating daily bars: {str(e)}")
+
+        if fetch_limit is not None and self.replay is None:
+            missing = missing[:fetch_limit]
+        end = pd.Timestamp(end_date)
+        for symbol, df in self.get_stock_data_many(missing, period='daily', days=(end_date - start_date).days):
+            frames[symbol] = df[(df.index >= pd.Timestamp(start_date)) & (df.index < end)] if not df.empty else df
+        return frames
+
+    def _stored_daily_history(self, symbols, start_date, end_date):
+        """读取本地覆盖区间完整且未过期的股票的日K线，不请求数据源"""
+        if self.bar_store is None:
+            return {}
+        last_day = end_date - timedelta(days=1)
+        frames = {}
+        for symbol in symbols:
+            coverage = self.bar_store.coverage(symbol, 'daily')
+            if coverage is None or coverage[0] > start_date:
+                continue
+            # 覆盖区间之后还有已走完的交易日，说明本地数据过期
+            if coverage[1] < last_day and trading_calendar.has_trading_day(coverage[1] + timedelta(days=1), last_day):
+                continue
+            frames[symbol] = self.bar_store.load(symbol, 'daily', start=start_date, end=last_day)
+        return frames
+
+    def _source_name(self):
+        """当前配置对应的上游数据源（ashare模式实际请求akshare）"""
+        return 'tushare' if DATA_SOURCE == 'tushare' else 'akshare'
+
+    def _get_pro_client(self):
+        """获取复用的tushare pro客户端"""
+        if self._pro is None:
+            with self._pro_lock:
+                if self._pro is None:
+                    self._pro = ts.pro_api()
+        return self._pro
+
+    def get_source_stats(self):
+        """获取各数据源的熔断状态和重试统计"""
+        return {name: guard.stats() for name, guard in self._source_guards.items()}
+
+    def _fetch_data(self, symbol, period, start_date, end_date):
+        """按配置的数据源拉取指定区间的数据，经过并发上限、限流、重试和熔断保护"""
+        source = self._source_name()
+        return self._source_guards[source].call(self._fetch_from_backend, symbol, period, start_date, end_date)
+
+    def _fetch_from_backend(self, symbol, period, start_date, end_date):
+        """直接调用对应的数据源接口"""
+        if DATA_SOURCE == 'ashare':
+            return self._get_ashare_data(symbol, period, start_date, end_date)
+        elif DATA_SOURCE == 'akshare':
+            return self._get_akshare_data(symbol, period, start_date, end_date)
+        elif DATA_SOURCE == 'tushare':
+            return self._get_tushare_data(symbol, period, start_date, end_date)
+        else:
+            # 默认使用akshare
+            return self._get_akshare_data(symbol, period, start_date, end_date)
     
-    def _get_ashare_data(self, symbol, period, days):
+    def _get_ashare_data(self, symbol, period, start_date, end_date):
         """使用Ashare风格的数据获取"""
         # 这里我们会导入Ashare的核心逻辑
         # 由于Ashare是一个独立的库，我们需要模拟其功能
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        end_date = end_date.strftime('%Y-%m-%d')
+        start_date = start_date.strftime('%Y-%m-%d')
         
         # 使用akshare作为替代
         if symbol.endswith('.XSHG') or symbol.endswith('SH'):
@@ -79,10 +433,10 @@ class DataProvider:
             
         return df
     
-    def _get_akshare_data(self, symbol, period, days):
+    def _get_akshare_data(self, symbol, period, start_date, end_date):
         """使用akshare获取数据"""
-        end_date = datetime.now().strftime('%Y%m%d')
-        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+        end_date = end_date.strftime('%Y%m%d')
+        start_date = start_date.strftime('%Y%m%d')
         
         if symbol.endswith('.XSHG') or symbol.endswith('SH'):
             code = symbol.replace('.XSHG', '').replace('SH', '')
@@ -108,25 +462,149 @@ class DataProvider:
         
         return df
     
-    def _get_tushare_data(self, symbol, period, days):
+    def _get_tushare_data(self, symbol, period, start_date, end_date):
         """使用tushare获取数据"""
-        pro = ts.pro_api()
+        pro = self._get_pro_client()
         
         # 转换股票代码格式
         ts_symbol = symbol.replace('.XSHG', '.SH').replace('.XSHE', '.SZ')
         
         # 获取数据
-        df = pro.daily(ts_code=ts_symbol, start_date=(
-            datetime.now() - timedelta(days=days)).strftime('%Y%m%d'),
-            end_date=datetime.now().strftime('%Y%m%d'))
+        df = pro.daily(ts_code=ts_symbol, start_date=start_date.strftime('%Y%m%d'),
+                       end_date=end_date.strftime('%Y%m%d'))
         
         if not df.empty:
             df['trade_date'] = pd.to_datetime(df['trade_date'])
             df.set_index('trade_date', inplace=True)
+            df.sort_index(inplace=True)
             df.rename(columns={'vol': 'volume'}, inplace=True)
         
         return df
 
+    def bulk_update_tushare(self, start_date, end_date=None, chunk_days=20, flush_rows=BULK_FLUSH_ROWS, progress=None):
+        """
+        按交易日批量下载全市场日K线（tushare）
+        每个交易日只调用一次 pro.daily(trade_date=...)，下载的K线在内存中累积，
+        累积到 flush_rows 行（或全部下载完）时按股票拆分，每只股票只写一次存储，
+        回补或每日更新的请求数与股票数量无关
+        :param start_date: 起始日期
+        :param end_date: 结束日期，默认今天
+        :param chunk_days: 每下载多少个交易日检查一次是否需要写入
+        :param flush_rows: 内存中累积多少行K线后写入存储，多年回补时控制内存占用和重写次数
+        :param progress: 可选回调 progress(已完成交易日数, 总交易日数, 已写入K线数, 已完成到的日期)，每次写入后调用
+        :return: 写入的K线条数
+        """
+        if self.bar_store is None:
+            raise ValueError("bulk_update_tushare requires BAR_STORE_ENABLED")
+
+        end_date = end_date or datetime.now()
+        pro = self._get_pro_client()
+        guard = self._source_guards['tushare']
+
+        calendar = guard.call(pro.trade_cal, exchange='SSE', is_open='1',
+                              start_date=start_date.strftime('%Y%m%d'),
+                              end_date=end_date.strftime('%Y%m%d'))
+        trade_dates = sorted(calendar['cal_date'])
+        complete_through = self._complete_through(end_date)
+
+        total_bars = 0
+        seen_symbols = set()
+        flush_start = start_date.date()
+        buffered, buffered_rows = [], 0
+
+        for offset in range(0, len(trade_dates), chunk_days):
+            chunk_dates = trade_dates[offset:offset + chunk_days]
+            for trade_date in chunk_dates:
+                df = guard.call(pro.daily, trade_date=trade_date)
+                if df is not None and not df.empty:
+                    buffered.append(df)
+                    buffered_rows += len(df)
+
+            done_dates = min(offset + chunk_days, len(trade_dates))
+            last_chunk = done_dates >= len(trade_dates)
+            if buffered_rows < flush_rows and not last_chunk:
+                logger.info(f"已下载 {done_dates}/{len(trade_dates)} 个交易日")
+                continue
+
+            flush_end = datetime.strptime(chunk_dates[-1], '%Y%m%d').date()
+            if last_chunk:
+                # 最后一段覆盖到结束日期（其后的非交易日也已确认没有K线）
+                flush_end = max(flush_end, end_date.date())
+            # 尚未收盘的交易日不计入覆盖区间（BarStore会忽略起点晚于定型日期的区间）
+            flush_end = min(flush_end, complete_through)
+
+            written = set()
+            if buffered:
+                bars_all = pd.concat(buffered)
+                bars_all['trade_date'] = pd.to_datetime(bars_all['trade_date'])
+                bars_all = bars_all.rename(columns={'vol': 'volume'})
+                for ts_code, bars in bars_all.groupby('ts_code'):
+                    symbol = ts_code.replace('.SH', '.XSHG').replace('.SZ', '.XSHE')
+                    bars = bars.set_index('trade_date').sort_index()
+                    self.bar_store.append(symbol, 'daily', bars, start=flush_start, complete_through=flush_end)
+                    written.add(symbol)
+                    total_bars += len(bars)
+
+            # 这段时间停牌的股票没有K线，但覆盖区间同样向前推进
+            for symbol in seen_symbols - written:
+                self.bar_store.append(symbol, 'daily', pd.DataFrame(), start=flush_start, complete_through=flush_end)
+            seen_symbols |= written
+
+            buffered, buffered_rows = [], 0
+            flush_start = flush_end + timedelta(days=1)
+            if progress:
+                progress(done_dates, len(trade_dates), total_bars, flush_end)
+
+        return total_bars
+
+    def get_market_snapshot(self):
+        """
+        获取全市场实时行情快照
+        一次请求返回全部A股的最新价，无论配置哪个数据源都使用akshare的实时行情表
+        :return: 以带交易所后缀的股票代码（如 600519.XSHG）为索引的DataFrame（与缓存共享，请勿原地修改）
+        """
+        if self.replay is not None:
+            return self.replay.get_snapshot()
+
+        cache_key = ('__market_snapshot__',)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        try:
+            df = self._source_guards['akshare'].call(ak.stock_zh_a_spot_em)
+            df = df.rename(columns=SNAPSHOT_COLUMNS)[list(SNAPSHOT_COLUMNS.values())]
+            df = df.drop_duplicates(subset='code')
+            # 行情表只有股票，按代码规则加上交易所后缀，与代码相同的指数（如上证指数000001）区分开
+            df.index = pd.Index([code_to_symbol(str(code)) for code in df.pop('code')], name='symbol')
+            # 停牌股票没有最新价
+            df = df[df['price'].notna()]
+
+            if self.cache is not None and not df.empty:
+                self.cache.put(cache_key, df)
+            return df
+        except Exception as e:
+            logger.error(f"Error getting market snapshot: {str(e)}")
+            return pd.DataFrame()
+
+    def get_quotes(self, symbols):
+        """
+        批量获取实时报价
+        整个监控列表只请求一次全市场快照，再按带交易所后缀的代码取出各股票的报价
+        快照中没有的代码（如指数）不在结果中，调用方使用最新K线
+        :param symbols: 股票代码列表
+        :return: {股票代码: {'name', 'price', 'change_pct', 'open', 'high', 'low', 'prev_close', 'volume', 'amount'}}
+        """
+        snapshot = self.get_market_snapshot()
+        if snapshot.empty:
+            return {}
+
+        keys = {symbol: normalize_symbol(symbol) for symbol in symbols}
+        matched = snapshot[snapshot.index.isin(list(keys.values()))]
+        records = matched.to_dict('index')
+        return {symbol: records[key] for symbol, key in keys.items() if key in records}
+
     def get_market_overview(self):
         """获取市场概览数据"""
         try:
@@ -137,9 +615,11 @@ class DataProvider:
                 '创业板指': '399006.XSHE',
             }
             
+            results = dict(self.get_stock_data_many(indices.values(), period='daily', days=1))
+
             overview = {}
             for name, code in indices.items():
-                data = self.get_stock_data(code, period='daily', days=1)
+                data = results.get(code, pd.DataFrame())
                 if not data.empty:
                     latest = data.iloc[-1]
                     overview[name] = {
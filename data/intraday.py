@@ -0,0 +1,83 @@
+"""
+分钟K线模块
+只向数据源拉取1分钟K线，5/15/30/60分钟和日K线均在本地聚合得到
+"""
+import pandas as pd
+
+# 支持的分钟周期及对应的分钟数
+MINUTE_PERIODS = {
+    '1min': 1,
+    '5min': 5,
+    '15min': 15,
+    '30min': 30,
+    '60min': 60,
+}
+
+# OHLCV聚合规则，只对数据中存在的列生效
+AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+    'amount': 'sum',
+}
+
+# 开盘时间（分钟）以及午休时长，用于把上下午两个时段拼接成连续的交易时间
+SESSION_OPEN_MINUTE = 9 * 60 + 30
+AFTERNOON_OPEN_MINUTE = 13 * 60
+LUNCH_BREAK_MINUTES = 90
+
+
+def _compress_lunch_break(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """
+    去掉午休时段：下午的时间统一减去90分钟，13:01 变为 11:31，15:00 变为 13:30
+    开盘集合竞价的09:30分钟并入第一根K线
+    """
+    minute_of_day = index.hour * 60 + index.minute
+    shifted = index.where(minute_of_day < AFTERNOON_OPEN_MINUTE,
+                          index - pd.Timedelta(minutes=LUNCH_BREAK_MINUTES))
+    first_bar = index.normalize() + pd.Timedelta(minutes=SESSION_OPEN_MINUTE + 1)
+    return shifted.where(minute_of_day > SESSION_OPEN_MINUTE, first_bar)
+
+
+def _restore_lunch_break(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """把压缩后的时间还原为实际时间，11:30 之后的时间加回90分钟"""
+    minute_of_day = index.hour * 60 + index.minute
+    morning_close = SESSION_OPEN_MINUTE + 120
+    return index.where(minute_of_day <= morning_close,
+                       index + pd.Timedelta(minutes=LUNCH_BREAK_MINUTES))
+
+
+def aggregate_bars(bars: pd.DataFrame, period: str) -> pd.DataFrame:
+    """
+    将1分钟K线聚合为更长周期
+    分钟K线以结束时间标记，与交易所一致：60分钟K线为10:30、11:30、14:00、15:00
+    :param bars: 以时间为索引的1分钟K线
+    :param period: 目标周期 ('1min', '5min', '15min', '30min', '60min', 'daily')
+    :return: 聚合后的K线
+    """
+    if bars.empty or period == '1min':
+        return bars
+
+    rules = {col: how for col, how in AGGREGATIONS.items() if col in bars.columns}
+
+    if period == 'daily':
+        daily = bars.groupby(bars.index.normalize()).agg(rules)
+        daily.index.name = 'date'
+        return daily
+
+    if period not in MINUTE_PERIODS:
+        raise ValueError(f"Unsupported intraday period: {period}")
+
+    minutes = MINUTE_PERIODS[period]
+    compressed = bars.set_axis(_compress_lunch_break(bars.index))
+    # 以09:30为起点划分区间，(09:30, 09:35] 记为 09:35
+    aggregated = compressed.resample(
+        f'{minutes}min', closed='right', label='right',
+        offset=pd.Timedelta(minutes=SESSION_OPEN_MINUTE % minutes)
+    ).agg(rules)
+    aggregated = aggregated.dropna(subset=['close'])
+    aggregated.index = _restore_lunch_break(aggregated.index)
+    aggregated.index.name = bars.index.name
+    return aggregated
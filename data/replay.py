@@ -0,0 +1,219 @@
+"""
+回放数据源模块
+从本地Parquet/CSV文件按模拟时钟回放K线，用于离线压测和基准测试
+目录结构与本地K线存储一致：{数据目录}/{周期}/{股票代码}.parquet 或 .csv
+"""
+import os
+import time
+import argparse
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from data.intraday import MINUTE_PERIODS, aggregate_bars
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedClock:
+    """
+    模拟时钟
+    从start开始按speed倍速流逝，也可以手动调整
+    """
+
+    def __init__(self, start: datetime = None, speed: float = 1.0):
+        self.start = start or datetime.now()
+        self.speed = speed
+        self._real_start = time.monotonic()
+        self._offset = timedelta(0)
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        with self._lock:
+            elapsed = (time.monotonic() - self._real_start) * self.speed
+            return self.start + timedelta(seconds=elapsed) + self._offset
+
+    def advance(self, delta: timedelta):
+        """手动快进"""
+        with self._lock:
+            self._offset += delta
+
+    def set(self, moment: datetime):
+        """跳转到指定时刻"""
+        with self._lock:
+            self.start = moment
+            self._real_start = time.monotonic()
+            self._offset = timedelta(0)
+
+
+class ReplaySource:
+    """本地K线回放源，只返回模拟时钟当前时刻之前的K线"""
+
+    def __init__(self, data_dir: str, clock: SimulatedClock):
+        self.data_dir = data_dir
+        self.clock = clock
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def symbols(self, period: str = 'daily') -> List[str]:
+        """回放目录中可用的股票代码"""
+        period_dir = os.path.join(self.data_dir, period)
+        if not os.path.isdir(period_dir):
+            return []
+        return sorted({os.path.splitext(name)[0] for name in os.listdir(period_dir)
+                       if name.endswith(('.parquet', '.csv'))})
+
+    def _load(self, symbol: str, period: str) -> pd.DataFrame:
+        key = (symbol, period)
+        with self._lock:
+            if key in self._frames:
+                return self._frames[key]
+
+        base = os.path.join(self.data_dir, period, symbol)
+        if os.path.exists(f"{base}.parquet"):
+            df = pd.read_parquet(f"{base}.parquet")
+        elif os.path.exists(f"{base}.csv"):
+            df = pd.read_csv(f"{base}.csv", index_col=0, parse_dates=True)
+        else:
+            df = pd.DataFrame()
+        if not df.empty:
+            df = df.sort_index()
+
+        with self._lock:
+            self._frames[key] = df
+        return df
+
+    def get_bars(self, symbol: str, period: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """
+        获取 [start_date, end_date] 区间内、且不晚于模拟时钟的K线
+        分钟周期优先读取对应周期的文件，没有时由1分钟K线聚合
+        """
+        end_date = min(end_date, self.clock.now())
+
+        if period in MINUTE_PERIODS and period != '1min' and self._load(symbol, period).empty:
+            bars = self._load(symbol, '1min')
+            bars = bars[(bars.index >= start_date) & (bars.index <= end_date)]
+            return aggregate_bars(bars, period)
+
+        bars = self._load(symbol, period)
+        if bars.empty:
+            return bars
+        if period in MINUTE_PERIODS:
+            return bars[(bars.index >= start_date) & (bars.index <= end_date)]
+        # 日K线以日期为索引，当日K线在收盘前也视为可见（相当于盘中最新价）
+        return bars[(bars.index >= pd.Timestamp(start_date.date())) & (bars.index <= pd.Timestamp(end_date.date()))]
+
+    def get_snapshot(self) -> pd.DataFrame:
+        """
+        按模拟时钟生成全市场快照
+        :return: 以带交易所后缀的股票代码为索引的DataFrame，列与实时行情快照一致
+        """
+        today = pd.Timestamp(self.clock.now().date())
+        rows = {}
+        for symbol in self.symbols('daily'):
+            bars = self._load(symbol, 'daily')
+            position = bars.index.searchsorted(today, side='right')
+            if position == 0:
+                continue
+            latest = bars.iloc[position - 1]
+            prev_close = bars['close'].iloc[position - 2] if position > 1 else latest['open']
+            rows[symbol] = {
+                'name': symbol,
+                'price': latest['close'],
+                'change_pct': (latest['close'] - prev_close) / prev_close * 100 if prev_close else 0.0,
+                'open': latest['open'],
+                'high': latest['high'],
+                'low': latest['low'],
+                'prev_close': prev_close,
+                'volume': latest['volume'],
+                'amount': latest.get('amount', np.nan)
+            }
+
+        snapshot = pd.DataFrame.from_dict(rows, orient='index')
+        snapshot.index.name = 'symbol'
+        return snapshot
+
+
+def synthetic_symbols(count: int) -> List[str]:
+    """生成沪深两市交替的合成股票代码"""
+    symbols = []
+    for i in range(count):
+        if i % 2 == 0:
+            symbols.append(f"{600000 + i // 2:06d}.XSHG")
+        else:
+            symbols.append(f"{i // 2 + 1:06d}.XSHE")
+    return symbols
+
+
+def generate_synthetic_bars(symbols: List[str], days: int = 250, end_date: datetime = None,
+                            seed: int = 42) -> Dict[str, pd.DataFrame]:
+    """
+    生成确定性的合成日K线（几何布朗运动价格，对数正态成交量，偶发放量）
+    :param symbols: 股票代码列表
+    :param days: 交易日数量
+    :param end_date: 最后一个交易日，默认今天
+    :param seed: 随机种子，相同参数生成的数据完全一致
+    :return: {股票代码: DataFrame}
+    """
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.now()
+    dates = pd.bdate_range(end=end_date.date(), periods=days, name='date')
+    n = len(symbols)
+
+    start_prices = rng.uniform(5, 200, n)
+    returns = rng.normal(0.0003, 0.02, (days, n))
+    close = start_prices * np.exp(np.cumsum(returns, axis=0))
+    open_ = np.vstack([start_prices, close[:-1]]) * (1 + rng.normal(0, 0.005, (days, n)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, (days, n))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, (days, n))))
+    volume = rng.lognormal(11, 0.4, (days, n)) * np.where(rng.random((days, n)) < 0.03, 3.0, 1.0)
+
+    frames = {}
+    for j, symbol in enumerate(symbols):
+        frames[symbol] = pd.DataFrame({
+            'open': open_[:, j].round(2),
+            'close': close[:, j].round(2),
+            'high': high[:, j].round(2),
+            'low': low[:, j].round(2),
+            'volume': volume[:, j].round(0),
+            'amount': (volume[:, j] * close[:, j] * 100).round(2)
+        }, index=dates)
+    return frames
+
+
+def write_fixtures(frames: Dict[str, pd.DataFrame], data_dir: str, period: str = 'daily', fmt: str = 'parquet'):
+    """将K线写入回放目录"""
+    period_dir = os.path.join(data_dir, period)
+    os.makedirs(period_dir, exist_ok=True)
+    for symbol, df in frames.items():
+        path = os.path.join(period_dir, f"{symbol}.{fmt}")
+        if fmt == 'csv':
+            df.to_csv(path)
+        else:
+            df.to_parquet(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成回放数据源使用的合成K线")
+    parser.add_argument('--symbols', type=int, default=1000, help='股票数量')
+    parser.add_argument('--days', type=int, default=250, help='交易日数量')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help='文件格式')
+    parser.add_argument('--out', default=None, help='输出目录，默认使用 REPLAY_DATA_DIR')
+    args = parser.parse_args()
+
+    from config.settings import REPLAY_DATA_DIR
+    out_dir = args.out or REPLAY_DATA_DIR
+
+    started = time.time()
+    frames = generate_synthetic_bars(synthetic_symbols(args.symbols), days=args.days, seed=args.seed)
+    write_fixtures(frames, out_dir, fmt=args.format)
+    print(f"已生成 {len(frames)} 只股票 x {args.days} 个交易日的K线到 {out_dir}，耗时 {time.time() - started:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
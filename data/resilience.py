@@ -0,0 +1,205 @@
+"""
+数据源容错模块
+为上游数据源提供令牌桶限流、指数退避重试和熔断保护
+"""
+import time
+import random
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+    pass
+
+
+# 单只股票的数据错误（代码无效、已退市、返回内容无法解析等）：数据源本身是正常的，
+# 不重试，也不计入熔断
+DATA_ERRORS = (KeyError, IndexError, ValueError, TypeError)
+
+
+def is_source_error(error: Exception) -> bool:
+    """
+    是否为数据源层面的错误（网络、超时、服务端错误、限流等），只有这类错误计入熔断
+    HTTP 4xx（429限流除外）视为请求本身的问题，按数据错误处理
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return not isinstance(error, DATA_ERRORS)
+
+
+class TokenBucket:
+    """令牌桶限流器，rate为每秒补充的令牌数，capacity为允许的突发请求数"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - closed: 正常放行，连续失败达到阈值后打开
+    - open: 直接拒绝请求，冷却时间过后进入半开
+    - half_open: 放行一个探测请求，成功则关闭，失败则重新打开
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # 半开状态只放行一个探测请求
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class SourceGuard:
+    """单个数据源的限流、重试和熔断组合"""
+
+    def __init__(self, name: str, rate: float = 5.0, burst: int = 10,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 failure_threshold: int = 5, recovery_timeout: float = 60, semaphore: threading.Semaphore = None):
+        self.name = name
+        # 数据源的并发上限，只在请求进行时占用，退避等待期间释放
+        self.semaphore = semaphore
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.data_errors = 0
+        self.last_error = None
+        self.last_error_at = None
+
+    def _backoff(self, attempt: int) -> float:
+        """带全抖动的指数退避时间"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _invoke(self, func, *args, **kwargs):
+        if self.semaphore is None:
+            return func(*args, **kwargs)
+        with self.semaphore:
+            return func(*args, **kwargs)
+
+    def call(self, func, *args, **kwargs):
+        """
+        通过并发上限、限流、重试和熔断调用数据源
+        单只股票的数据错误（见 is_source_error）直接抛出，不重试、不计入熔断
+        :raises CircuitOpenError: 熔断器打开时直接抛出
+        """
+        if not self.breaker.allow_request():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"数据源 {self.name} 熔断中，暂停请求")
+
+        with self._lock:
+            self.calls += 1
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                result = self._invoke(func, *args, **kwargs)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                error = e
+                with self._lock:
+                    self.last_error = str(e)
+                    self.last_error_at = datetime.now().isoformat()
+                if not is_source_error(e):
+                    # 数据源有响应，只是这只股票没有可用数据
+                    with self._lock:
+                        self.data_errors += 1
+                    self.breaker.record_success()
+                    raise
+                if attempt == self.max_retries:
+                    break
+                with self._lock:
+                    self.retries += 1
+                delay = self._backoff(attempt)
+                logger.warning(f"数据源 {self.name} 请求失败，{delay:.2f}秒后第{attempt + 1}次重试: {str(e)}")
+                time.sleep(delay)
+
+        with self._lock:
+            self.failures += 1
+        self.breaker.record_failure()
+        raise error
+
+    def stats(self) -> dict:
+        """限流、重试和熔断统计"""
+        with self._lock:
+            return {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "times_opened": self.breaker.times_opened,
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "data_errors": self.data_errors,
+                "last_error": self.last_error,
+                "last_error_at": self.last_error_at
+            }
@@ -0,0 +1,111 @@
+"""
+交易日历模块
+判断A股交易日和交易时段，供缓存失效和增量拉取使用
+"""
+import threading
+import logging
+from datetime import datetime, date, time, timedelta
+
+import akshare as ak
+
+from config.settings import TRADING_HOURS_START, TRADING_HOURS_END
+
+logger = logging.getLogger(__name__)
+
+# 午间休市时段
+LUNCH_BREAK_START = "11:30"
+LUNCH_BREAK_END = "13:00"
+
+# 交易日历加载失败后的重试间隔（秒）
+CALENDAR_RETRY_SECONDS = 3600
+
+
+def _parse_time(value: str) -> time:
+    return datetime.strptime(value, "%H:%M").time()
+
+
+class TradingCalendar:
+    """
+    A股交易日历
+    交易日列表来自新浪交易日历，获取失败时退化为按工作日判断
+    """
+
+    def __init__(self):
+        self.session_open = _parse_time(TRADING_HOURS_START)
+        self.session_close = _parse_time(TRADING_HOURS_END)
+        self.lunch_start = _parse_time(LUNCH_BREAK_START)
+        self.lunch_end = _parse_time(LUNCH_BREAK_END)
+        self._trade_dates = None
+        self._last_listed_day = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+
+    def _load_trade_dates(self):
+        """懒加载交易日列表"""
+        if self._trade_dates is not None:
+            return self._trade_dates
+        with self._lock:
+            if self._trade_dates is not None:
+                return self._trade_dates
+            now = datetime.now()
+            if self._last_attempt and (now - self._last_attempt).total_seconds() < CALENDAR_RETRY_SECONDS:
+                return None
+            self._last_attempt = now
+            try:
+                df = ak.tool_trade_date_hist_sina()
+                self._trade_dates = set(df['trade_date'])
+                self._last_listed_day = max(self._trade_dates)
+                logger.info(f"交易日历加载完成，共 {len(self._trade_dates)} 个交易日")
+            except Exception as e:
+                logger.warning(f"交易日历加载失败，按工作日判断: {str(e)}")
+            return self._trade_dates
+
+    def is_trading_day(self, day: date) -> bool:
+        """判断是否为交易日"""
+        trade_dates = self._load_trade_dates()
+        # 新浪日历通常覆盖到当年年底，超出范围的日期按工作日判断
+        if trade_dates and day <= self._last_listed_day:
+            return day in trade_dates
+        return day.weekday() < 5
+
+    def has_trading_day(self, start: date, end: date) -> bool:
+        """判断 [start, end] 区间内是否存在交易日"""
+        day = start
+        while day <= end:
+            if self.is_trading_day(day):
+                return True
+            day += timedelta(days=1)
+        return False
+
+    def is_trading_session(self, now: datetime) -> bool:
+        """判断当前是否处于连续竞价时段"""
+        if not self.is_trading_day(now.date()):
+            return False
+        t = now.time()
+        return (self.session_open <= t < self.lunch_start) or (self.lunch_end <= t < self.session_close)
+
+    def next_session_start(self, now: datetime) -> datetime:
+        """下一个交易时段（上午或下午）的开始时间"""
+        if self.is_trading_day(now.date()):
+            t = now.time()
+            if t < self.session_open:
+                return datetime.combine(now.date(), self.session_open)
+            if self.lunch_start <= t < self.lunch_end:
+                return datetime.combine(now.date(), self.lunch_end)
+
+        day = now.date() + timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return datetime.combine(day, self.session_open)
+
+    def is_day_complete(self, day: date, now: datetime) -> bool:
+        """判断某一日的日K线是否已定型"""
+        if day < now.date():
+            return True
+        if day > now.date():
+            return False
+        return not self.is_trading_day(day) or now.time() >= self.session_close
+
+
+# 全局交易日历实例
+trading_calendar = TradingCalendar()
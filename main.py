@@ -5,15 +5,18 @@
 import logging
 import schedule
 import time
-from datetime import datetime, timedelta
 import threading
 import os
-from typing import Dict, List
+import math
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List
 
-from config.settings import WATCHLIST, TRADING_HOURS_START, TRADING_HOURS_END, POST_MARKET_ANALYSIS_TIME
+from config.settings import WATCHLIST, POST_MARKET_ANALYSIS_TIME, AI_MAX_CONCURRENCY, AI_CALL_TIMEOUT
 from data.data_provider import data_provider
 from analysis.ai_analyzer import ai_analyzer
 from monitoring.risk_monitor import risk_monitor
+from monitoring.alert_store import day_range
+from monitoring.event_monitor import EventDrivenMonitor
 from notification.notification_service import notification_service
 
 # 配置日志
@@ -24,65 +27,128 @@ class StockAnalysisSystem:
     def __init__(self):
         self.watchlist = WATCHLIST
         self.running = False
-        self.trading_hours_start = TRADING_HOURS_START
-        self.trading_hours_end = TRADING_HOURS_END
         self.post_market_time = POST_MARKET_ANALYSIS_TIME
-    
-    def is_trading_hour(self) -> bool:
-        """检查是否在交易时间内"""
-        current_time = datetime.now().strftime("%H:%M")
-        return self.trading_hours_start <= current_time <= self.trading_hours_end
+        # 停止信号，设置后所有等待立即返回
+        self._stop_event = threading.Event()
+        self.event_monitor = EventDrivenMonitor()
     
     def real_time_monitoring(self):
-        """实时监控功能"""
+        """
+        实时监控功能
+        交易时段内轮询行情快照，只检查报价有变化的股票；非交易时段休眠到下一个交易时段
+        """
         logger.info("开始实时监控...")
+        self.event_monitor.run(lambda: list(self.watchlist), self._stop_event, self._handle_alert)
+    
+    def _handle_alert(self, alert: Dict):
+        """发送预警通知"""
+        logger.info(f"检测到预警: {alert['message']}")
+        notification_service.send_alert_notification(alert)
+    
+    def _run_concurrently(self, tasks: Dict[str, Callable], timeout: float = AI_CALL_TIMEOUT) -> Dict:
+        """
+        在线程池中并发执行任务，最多同时执行 AI_MAX_CONCURRENCY 个
+        单个任务失败或超时不影响其他任务
+        :param tasks: {任务名: 无参函数}
+        :param timeout: 单个任务从开始执行起的超时秒数（排队时间不计入）
+        :return: {任务名: 返回值}，失败或超时的任务返回异常对象
+        """
+        if not tasks:
+            return {}
+        started = {}
         
-        while self.running:
-            if self.is_trading_hour():
-                logger.info("正在进行盘中监控...")
-                
-                # 监控股票风险和机会
-                alerts = risk_monitor.monitor_stocks(self.watchlist)
-                
-                # 发送预警通知
-                for alert in alerts:
-                    logger.info(f"检测到预警: {alert['message']}")
-                    notification_service.send_alert_notification(alert)
+        def timed(name, func):
+            started[name] = time.monotonic()
+            return func()
+        
+        workers = max(1, min(AI_MAX_CONCURRENCY, len(tasks)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {name: executor.submit(timed, name, func) for name, func in tasks.items()}
+            # 所有任务的总时限，防止执行中的任务一直占满线程导致排队的任务无法开始
+            final_deadline = time.monotonic() + timeout * math.ceil(len(tasks) / workers)
+            pending, timed_out = set(futures), set()
+            while pending:
+                now = time.monotonic()
+                deadlines = [started[name] + timeout for name in pending if name in started]
+                wait_until = min(deadlines + [final_deadline])
+                wait([futures[name] for name in pending], timeout=max(wait_until - now, 0),
+                     return_when=FIRST_COMPLETED)
                 
-                # 每5分钟检查一次
-                time.sleep(300)  # 5分钟
-            else:
-                logger.info("非交易时间，暂停实时监控...")
-                # 非交易时间休眠更长时间
-                time.sleep(600)  # 10分钟
+                now = time.monotonic()
+                for name in list(pending):
+                    if futures[name].done():
+                        pending.discard(name)
+                    elif now >= final_deadline or (name in started and now - started[name] >= timeout):
+                        pending.discard(name)
+                        timed_out.add(name)
+            
+            results = {}
+            for name, future in futures.items():
+                if name in timed_out:
+                    results[name] = TimeoutError(f"超过 {timeout:.0f} 秒未完成")
+                elif future.exception() is not None:
+                    results[name] = future.exception()
+                else:
+                    results[name] = future.result()
+            return results
+        finally:
+            # 超时的任务在后台线程中自行结束，不阻塞报告
+            executor.shutdown(wait=False, cancel_futures=True)
     
     def daily_analysis(self):
-        """每日分析功能（盘后）"""
+        """
+        每日分析功能（盘后）
+        市场概览、个股分析和策略生成并发执行，单项失败只在报告中标注
+        """
         logger.info("开始盘后分析...")
         
         try:
+            analysis_symbols = self.watchlist[:5]  # 只分析前5只股票
+            strategy_symbols = self.watchlist[:3]  # 为前3只股票生成策略
+            tasks = {'market_overview': data_provider.get_market_overview}
+            # 关注股票合并为一次批量请求
+            tasks['analysis'] = lambda: ai_analyzer.analyze_stocks_batch(analysis_symbols)
+            for symbol in strategy_symbols:
+                tasks[f"strategy:{symbol}"] = lambda symbol=symbol: ai_analyzer.generate_trading_strategy(symbol, "momentum")
+            
+            started = time.time()
+            results = self._run_concurrently(tasks)
+            logger.info(f"盘后分析 {len(tasks)} 项任务完成，耗时 {time.time() - started:.1f}秒")
+            
             # 获取市场概览
-            market_overview = data_provider.get_market_overview()
+            market_overview = results['market_overview']
             market_overview_str = ""
+            if isinstance(market_overview, Exception):
+                logger.error(f"获取市场概览失败: {str(market_overview)}")
+                market_overview = {}
             for index_name, data in market_overview.items():
                 market_overview_str += f"- {index_name}: {data['close']:.2f} ({data['change_pct']:+.2f}%)\n"
             
             # 分析关注股票
             watched_stocks_analysis = ""
-            for symbol in self.watchlist[:5]:  # 只分析前5只股票
-                try:
-                    analysis = ai_analyzer.analyze_stock(symbol)
-                    if 'error' not in analysis:
-                        watched_stocks_analysis += f"\n**{symbol}**:\n{analysis['analysis'][:200]}...\n"
-                    else:
-                        watched_stocks_analysis += f"\n**{symbol}**: 分析失败 - {analysis['error']}\n"
-                except Exception as e:
-                    watched_stocks_analysis += f"\n**{symbol}**: 分析错误 - {str(e)}\n"
+            batch = results['analysis']
+            for symbol in analysis_symbols:
+                analysis = batch if isinstance(batch, Exception) else batch[symbol]
+                if isinstance(analysis, Exception):
+                    watched_stocks_analysis += f"\n**{symbol}**: 分析错误 - {str(analysis)}\n"
+                elif 'error' not in analysis:
+                    watched_stocks_analysis += (f"\n**{symbol}**: {analysis['recommendation']}，"
+                                                f"目标价 {analysis['target_price']}，止损 {analysis['stop_loss']}\n"
+                                                f"{analysis['summary']}\n")
+                else:
+                    watched_stocks_analysis += f"\n**{symbol}**: 分析失败 - {analysis['error']}\n"
             
-            # 获取风险提醒
+            # 获取风险提醒（当日警报，优先列出高风险等级）
             risk_alerts = ""
-            recent_alerts = risk_monitor.alerts[-10:]  # 最近10个警报
+            since, until = day_range()
+            counts = risk_monitor.summarize_alerts(since, until)
+            recent_alerts, _ = risk_monitor.query_alerts(since=since, until=until, severity='high', limit=10)
+            if not recent_alerts:
+                recent_alerts, _ = risk_monitor.query_alerts(since=since, until=until, limit=10)
             if recent_alerts:
+                risk_alerts += (f"今日共 {sum(counts.values())} 个警报（高 {counts.get('high', 0)}，"
+                                f"中 {counts.get('medium', 0)}，低 {counts.get('low', 0)}）\n")
                 for alert in recent_alerts:
                     risk_alerts += f"- {alert['symbol']}: {alert['message']} ({alert['severity']})\n"
             else:
@@ -90,15 +156,14 @@ class StockAnalysisSystem:
             
             # AI策略建议
             ai_strategies = ""
-            for symbol in self.watchlist[:3]:  # 为前3只股票生成策略
-                try:
-                    strategy = ai_analyzer.generate_trading_strategy(symbol, "momentum")
-                    if 'error' not in strategy:
-                        ai_strategies += f"\n**{symbol}策略**: {strategy['strategy'][:150]}...\n"
-                    else:
-                        ai_strategies += f"\n**{symbol}策略**: 生成失败 - {strategy['error']}\n"
-                except Exception as e:
-                    ai_strategies += f"\n**{symbol}策略**: 生成错误 - {str(e)}\n"
+            for symbol in strategy_symbols:
+                strategy = results[f"strategy:{symbol}"]
+                if isinstance(strategy, Exception):
+                    ai_strategies += f"\n**{symbol}策略**: 生成错误 - {str(strategy)}\n"
+                elif 'error' not in strategy:
+                    ai_strategies += f"\n**{symbol}策略**: {strategy['strategy'][:150]}...\n"
+                else:
+                    ai_strategies += f"\n**{symbol}策略**: 生成失败 - {strategy['error']}\n"
             
             # 组织报告数据
             report_data = {
@@ -175,6 +240,7 @@ class StockAnalysisSystem:
         logger.info("启动股票分析系统...")
         
         self.running = True
+        self._stop_event.clear()
         
         # 设置定时任务
         self.setup_schedule()
@@ -188,7 +254,7 @@ class StockAnalysisSystem:
             while self.running:
                 # 执行定时任务
                 schedule.run_pending()
-                time.sleep(60)  # 每分钟检查一次定时任务
+                self._stop_event.wait(60)  # 每分钟检查一次定时任务
         except KeyboardInterrupt:
             logger.info("收到停止信号，正在关闭系统...")
             self.stop()
@@ -200,6 +266,8 @@ class StockAnalysisSystem:
         """停止系统"""
         logger.info("正在停止系统...")
         self.running = False
+        # 唤醒正在等待的监控线程和主循环
+        self._stop_event.set()
         logger.info("系统已停止")
 
 # 创建全局系统实例
@@ -210,11 +278,35 @@ def run_web_interface():
     from web.app import run_web_app
     run_web_app()
 
+def run_backfill(argv):
+    """回补历史K线到本地存储"""
+    from data.backfill import main as backfill_main
+    backfill_main(argv)
+
+def run_market_scan(argv):
+    """全市场信号扫描"""
+    from monitoring.market_scanner import main as scan_main
+    scan_main(argv)
+
+def run_backtest(argv):
+    """回测警报信号"""
+    from monitoring.backtest import main as backtest_main
+    backtest_main(argv)
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == "--web":
         # 如果传入 --web 参数，则启动Web界面
         run_web_interface()
+    elif len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        # python main.py backfill [--universe ...] 回补历史数据
+        run_backfill(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "scan":
+        # python main.py scan [--once] [--notify] 扫描全部A股
+        run_market_scan(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "backtest":
+        # python main.py backtest [--universe ...] [--years 3] 回测警报信号
+        run_backtest(sys.argv[2:])
     else:
         # 否则启动原来的监控系统
         stock_system.run()
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""
+警报规则模块
+警报条件以JSON中的表达式声明，加载时编译为NumPy向量化谓词，每轮对全部股票批量求值
+
+规则文件格式：
+{
+    "include_defaults": true,
+    "groups": {"银行": ["600000.XSHG", "000001.XSHE"]},
+    "rules": [
+        {
+            "type": "OVERBOUGHT",
+            "when": "bars >= 30 and rsi > 80",
+            "severity": "high",
+            "message": "RSI超买信号: {rsi:.2f}",
+            "groups": ["银行"]
+        }
+    ]
+}
+
+表达式可使用指标快照中的字段（见 FEATURE_NAMES）、数字、算术运算、比较、and/or/not 和 abs()；
+symbols/groups 限定规则适用的股票（分组为空时不适用于任何股票），exclude 排除股票或分组，都不填时适用于全部股票；
+自定义规则与默认规则类型相同时，在其适用的股票上替代该类型的默认规则（如上例只改变银行股的超买阈值）
+"""
+import os
+import ast
+import json
+import logging
+import string
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from config.settings import (RSI_OVERBOUGHT, RSI_OVERSOLD, PRICE_ALERT_PERCENT, PRICE_ALERT_HIGH_PERCENT,
+                             VOLUME_RATIO_THRESHOLD, BREAKOUT_FACTOR, SUPPORT_RESISTANCE_PROXIMITY,
+                             ALERT_RULES_FILE)
+
+logger = logging.getLogger(__name__)
+
+# 规则表达式和警报消息可以引用的指标
+FEATURE_NAMES = (
+    'price', 'prev_price', 'rsi', 'macd', 'macd_signal', 'macd_hist', 'high_20', 'resistance', 'support',
+    'avg_price_10', 'change_pct', 'volume', 'avg_volume_10', 'volume_ratio', 'bars'
+)
+
+SEVERITIES = ('low', 'medium', 'high')
+
+# 技术指标和成交量检查所需的最少K线数
+TECHNICAL_MIN_BARS = 30
+VOLUME_MIN_BARS = 10
+
+_COMPARE_OPS = (ast.Gt, ast.GtE, ast.Lt, ast.LtE, ast.Eq, ast.NotEq)
+_ARITHMETIC_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+
+
+class RuleError(ValueError):
+    """规则定义错误"""
+
+
+class _VectorizeTransformer(ast.NodeTransformer):
+    """
+    校验表达式只包含允许的语法，并改写为数组运算：
+    and/or/not 改为 &/|/~，连续比较 a < b < c 拆成 (a < b) & (b < c)
+    """
+
+    def generic_visit(self, node):
+        raise RuleError(f"不支持的表达式语法: {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_BoolOp(self, node):
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        values = [self.visit(value) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = ast.BinOp(left=result, op=op, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=self.visit(node.operand))
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+        raise RuleError(f"不支持的运算符: {type(node.op).__name__}")
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _ARITHMETIC_OPS):
+            raise RuleError(f"不支持的运算符: {type(node.op).__name__}")
+        return ast.BinOp(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(comparator) for comparator in node.comparators]
+        parts = []
+        for i, op in enumerate(node.ops):
+            if not isinstance(op, _COMPARE_OPS):
+                raise RuleError(f"不支持的比较运算: {type(op).__name__}")
+            parts.append(ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]]))
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+        return result
+
+    def visit_Call(self, node):
+        if not (isinstance(node.func, ast.Name) and node.func.id == 'abs') or len(node.args) != 1 or node.keywords:
+            raise RuleError("只支持 abs(x) 函数调用")
+        return ast.Call(func=ast.Name(id='abs', ctx=ast.Load()), args=[self.visit(node.args[0])], keywords=[])
+
+    def visit_Name(self, node):
+        if node.id not in FEATURE_NAMES:
+            raise RuleError(f"未知的指标: {node.id}")
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise RuleError(f"只支持数字常量: {node.value!r}")
+        return node
+
+
+def compile_expression(expression: str):
+    """
+    将规则表达式编译为代码对象，求值时传入 {指标名: 数组} 得到布尔数组
+    :raises RuleError: 表达式包含不允许的语法或未知指标
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise RuleError(f"表达式语法错误: {expression}: {e.msg}")
+    tree = ast.fix_missing_locations(_VectorizeTransformer().visit(tree))
+    return compile(tree, f"<rule: {expression}>", 'eval')
+
+
+class AlertRule:
+    """编译后的单条规则"""
+
+    def __init__(self, definition: Dict, groups: Dict[str, List[str]]):
+        try:
+            self.type = definition['type']
+            self.when = definition['when']
+        except KeyError as e:
+            raise RuleError(f"规则缺少字段: {e.args[0]}")
+        self.severity = definition.get('severity', 'medium')
+        if self.severity not in SEVERITIES:
+            raise RuleError(f"未知的风险等级: {self.severity}")
+        self.message = definition.get('message', self.type)
+        for _, field, _, _ in string.Formatter().parse(self.message):
+            if field and field not in FEATURE_NAMES:
+                raise RuleError(f"消息引用了未知的指标: {field}")
+        self.code = compile_expression(self.when)
+
+        # None 表示未限定股票（适用于全部股票）；配置了 symbols/groups 但解析为空时不适用于任何股票
+        if 'symbols' in definition or 'groups' in definition:
+            self.symbols = self._resolve(definition.get('symbols', []), definition.get('groups', []), groups)
+        else:
+            self.symbols = None
+        self.exclude = self._resolve(definition.get('exclude', []), definition.get('exclude', []), groups,
+                                     ignore_unknown=True)
+        # 替代本规则的自定义规则，在它们适用的股票上本规则不生效
+        self.replaced_by = []
+
+    @staticmethod
+    def _resolve(symbols: List[str], group_names: List[str], groups: Dict[str, List[str]],
+                 ignore_unknown: bool = False) -> frozenset:
+        resolved = set(symbol for symbol in symbols if symbol not in groups)
+        for name in group_names:
+            if name in groups:
+                resolved.update(groups[name])
+            elif not ignore_unknown:
+                raise RuleError(f"未知的股票分组: {name}")
+        return frozenset(resolved)
+
+    def scope(self, symbols: np.ndarray) -> np.ndarray:
+        """规则适用于哪些股票"""
+        if self.symbols is None:
+            mask = np.ones(len(symbols), dtype=bool)
+        else:
+            mask = np.isin(symbols, list(self.symbols))
+        if self.exclude:
+            mask &= ~np.isin(symbols, list(self.exclude))
+        for rule in self.replaced_by:
+            mask &= ~rule.scope(symbols)
+        return mask
+
+    def evaluate(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = eval(self.code, {'__builtins__': {}, 'abs': np.abs}, features)
+        return np.broadcast_to(np.asarray(result, dtype=bool), features['price'].shape)
+
+
+class RuleSet:
+    """一组编译后的规则，按规则顺序和股票顺序生成警报"""
+
+    def __init__(self, rules: List[AlertRule]):
+        self.rules = rules
+
+    def evaluate(self, symbols: List[str], features: Dict[str, np.ndarray]) -> List[Dict]:
+        """
+        对全部股票批量求值
+        :param symbols: 与指标数组对应的股票代码
+        :param features: {指标名: 数组}，缺少 change_pct 时由价格和10日均价计算
+        :return: 按股票顺序、同一股票内按规则顺序排列的警报
+        """
+        if not symbols:
+            return []
+        features = with_derived_features(features)
+        names = np.asarray(symbols)
+        timestamp = datetime.now().isoformat()
+
+        hits = []  # (股票序号, 规则序号)
+        for order, rule in enumerate(self.rules):
+            mask = rule.evaluate(features) & rule.scope(names)
+            hits.extend((j, order) for j in np.flatnonzero(mask))
+        hits.sort()
+
+        alerts = []
+        for j, order in hits:
+            rule = self.rules[order]
+            values = {name: features[name][j] for name in FEATURE_NAMES}
+            alerts.append({
+                "type": rule.type,
+                "symbol": symbols[j],
+                "message": rule.message.format(**values),
+                "severity": rule.severity,
+                "timestamp": timestamp
+            })
+        return alerts
+
+
+def stack_features(snapshots: List[Dict[str, float]]) -> Dict[str, np.ndarray]:
+    """将逐只股票的指标快照（IndicatorEngine.sync 的结果）合并为 {指标名: 数组}"""
+    return {name: np.array([snapshot.get(name, np.nan) for snapshot in snapshots], dtype=float)
+            for name in FEATURE_NAMES if name != 'change_pct'}
+
+
+def with_derived_features(features: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """补充由其他指标派生的字段"""
+    if 'change_pct' in features:
+        return features
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change_pct = (features['price'] - features['avg_price_10']) / features['avg_price_10'] * 100
+    return {**features, 'change_pct': change_pct}
+
+
+def default_rules() -> List[Dict]:
+    """由策略参数生成的默认规则，与 RiskMonitor 的各项检查一致"""
+    technical = f"bars >= {TECHNICAL_MIN_BARS}"
+    near_resistance = f"abs(price - resistance) / resistance < {SUPPORT_RESISTANCE_PROXIMITY}"
+    near_support = f"abs(price - support) / support < {SUPPORT_RESISTANCE_PROXIMITY}"
+    return [
+        {"type": "OVERBOUGHT", "when": f"{technical} and rsi > {RSI_OVERBOUGHT}",
+         "severity": "medium", "message": "RSI超买信号: {rsi:.2f}"},
+        {"type": "OVERSOLD", "when": f"{technical} and rsi < {RSI_OVERSOLD}",
+         "severity": "medium", "message": "RSI超卖信号: {rsi:.2f}"},
+        {"type": "BREAKOUT",
+         "when": f"{technical} and price > high_20 * {BREAKOUT_FACTOR} and prev_price <= high_20 * {BREAKOUT_FACTOR}",
+         "severity": "high", "message": "价格突破信号: {price:.2f}"},
+        {"type": "NEAR_RESISTANCE", "when": f"{technical} and {near_resistance}",
+         "severity": "low", "message": "价格接近阻力位: {resistance:.2f}"},
+        {"type": "NEAR_SUPPORT", "when": f"{technical} and {near_support} and not {near_resistance}",
+         "severity": "low", "message": "价格接近支撑位: {support:.2f}"},
+        {"type": "SHARP_INCREASE", "when": f"change_pct >= {PRICE_ALERT_HIGH_PERCENT}",
+         "severity": "high", "message": "价格异动: {change_pct:+.2f}% (当前价: {price:.2f})"},
+        {"type": "SHARP_INCREASE", "when": f"{PRICE_ALERT_PERCENT} <= change_pct < {PRICE_ALERT_HIGH_PERCENT}",
+         "severity": "medium", "message": "价格异动: {change_pct:+.2f}% (当前价: {price:.2f})"},
+        {"type": "SHARP_DECREASE", "when": f"change_pct <= -{PRICE_ALERT_HIGH_PERCENT}",
+         "severity": "high", "message": "价格异动: {change_pct:+.2f}% (当前价: {price:.2f})"},
+        {"type": "SHARP_DECREASE", "when": f"-{PRICE_ALERT_HIGH_PERCENT} < change_pct <= -{PRICE_ALERT_PERCENT}",
+         "severity": "medium", "message": "价格异动: {change_pct:+.2f}% (当前价: {price:.2f})"},
+        {"type": "HIGH_VOLUME",
+         "when": f"bars >= {VOLUME_MIN_BARS} and avg_volume_10 > 0 and volume_ratio >= {VOLUME_RATIO_THRESHOLD}",
+         "severity": "medium", "message": "成交量异常: {volume_ratio:.2f}x 平均值"},
+    ]
+
+
+def compile_rules(config: Dict) -> RuleSet:
+    """
+    编译规则配置
+    :param config: 规则文件内容，include_defaults 为true（默认）时在默认规则之后追加自定义规则，
+                   自定义规则在其适用的股票上替代同类型的默认规则
+    :raises RuleError: 规则定义有误
+    """
+    groups = config.get('groups', {})
+    defaults = [AlertRule(definition, groups) for definition in default_rules()] \
+        if config.get('include_defaults', True) else []
+    custom = [AlertRule(definition, groups) for definition in config.get('rules', [])]
+    for rule in defaults:
+        rule.replaced_by = [other for other in custom if other.type == rule.type]
+    return RuleSet(defaults + custom)
+
+
+def load_rules(path: str = ALERT_RULES_FILE) -> RuleSet:
+    """加载规则文件，文件不存在或有误时使用默认规则"""
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                rule_set = compile_rules(json.load(f))
+            logger.info(f"已加载警报规则 {path}，共 {len(rule_set.rules)} 条")
+            return rule_set
+        except Exception as e:
+            logger.error(f"加载警报规则失败 {path}: {str(e)}，使用默认规则")
+    return compile_rules({})
+
+
+# 全局警报规则实例
+alert_rules = load_rules()
@@ -0,0 +1,136 @@
+"""
+警报存储模块
+警报持久化到SQLite（WAL模式），按时间、股票、类型和风险等级建立索引，支持分页查询
+"""
+import os
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 单次查询最多返回的警报条数
+MAX_QUERY_LIMIT = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts (symbol, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts (type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts (severity, timestamp);
+"""
+
+_COLUMNS = ('id', 'timestamp', 'symbol', 'type', 'severity', 'message')
+
+
+class AlertStore:
+    """
+    SQLite警报存储
+    所有线程共享一个连接，写入按批在一个事务内完成；时间以ISO格式字符串保存，可直接按字典序比较
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def add_many(self, alerts: List[Dict]) -> int:
+        """
+        批量写入警报
+        :return: 写入的条数
+        """
+        if not alerts:
+            return 0
+        rows = [(alert['timestamp'], alert['symbol'], alert['type'], alert['severity'], alert['message'])
+                for alert in alerts]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO alerts (timestamp, symbol, type, severity, message) VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    @staticmethod
+    def _filters(since: str = None, until: str = None, symbol: str = None, alert_type: str = None,
+                 severity: str = None) -> Tuple[List[str], List]:
+        clauses, params = [], []
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        if alert_type:
+            clauses.append("type = ?")
+            params.append(alert_type)
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity)
+        return clauses, params
+
+    def query(self, since: str = None, until: str = None, symbol: str = None, alert_type: str = None,
+              severity: str = None, cursor: int = None, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """
+        分页查询警报，每页是满足条件的最新 limit 条，页内按时间先后排列
+        按 (timestamp, id) 倒序翻页，与各索引的列顺序一致（索引隐含id），不需要额外排序
+        :param since: 起始时间（含），ISO格式
+        :param until: 结束时间（不含），ISO格式
+        :param cursor: 上一页返回的游标（该页最早一条警报的id），只返回更早的警报
+        :return: (警报列表, 下一页游标)，没有更多数据时游标为None
+        """
+        limit = max(1, min(int(limit), MAX_QUERY_LIMIT))
+        clauses, params = self._filters(since, until, symbol, alert_type, severity)
+
+        with self._lock:
+            if cursor is not None:
+                row = self._conn.execute("SELECT timestamp FROM alerts WHERE id = ?", (int(cursor),)).fetchone()
+                if row is None:
+                    return [], None
+                clauses.append("timestamp <= ? AND (timestamp < ? OR id < ?)")
+                params.extend([row['timestamp'], row['timestamp'], int(cursor)])
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM alerts {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                params + [limit + 1]).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = rows[-1]['id'] if has_more else None
+        return [dict(row) for row in reversed(rows)], next_cursor
+
+    def summary(self, since: str = None, until: str = None) -> Dict[str, int]:
+        """按风险等级统计警报数量"""
+        clauses, params = self._filters(since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT severity, COUNT(*) AS count FROM alerts {where} GROUP BY severity", params).fetchall()
+        return {row['severity']: row['count'] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def day_range(day=None) -> Tuple[str, str]:
+    """某一天（默认今天）的 [起始, 结束) 时间，用于按日查询"""
+    day = day or datetime.now().date()
+    start = datetime.combine(day, datetime.min.time())
+    return start.isoformat(), (start + timedelta(days=1)).isoformat()
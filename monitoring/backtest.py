@@ -0,0 +1,219 @@
+"""
+信号回测模块
+用本地历史K线按日回放 RiskMonitor 的警报规则，按时间和股票向量化计算，
+统计各类警报之后1/5/20个交易日的收益、命中率、精确率和召回率
+"""
+import json
+import time
+import argparse
+import logging
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from data.data_provider import data_provider
+from data.backfill import load_universe
+from monitoring.alert_rules import RuleSet, alert_rules, with_derived_features
+from monitoring.indicators import (RSI_WINDOW, MACD_FAST, MACD_SLOW, MACD_SIGNAL, BREAKOUT_LOOKBACK,
+                                   SUPPORT_RESISTANCE_LOOKBACK, AVERAGE_WINDOW)
+
+logger = logging.getLogger(__name__)
+
+# 前瞻收益的交易日数
+HORIZONS = (1, 5, 20)
+
+# 每次计算的股票（列）数，控制内存占用
+CHUNK_SYMBOLS = 500
+
+# 各类警报预期的价格方向：1 上涨，-1 下跌，0 不区分方向（大幅波动即视为命中）
+SIGNAL_DIRECTIONS = {
+    'OVERBOUGHT': -1,
+    'OVERSOLD': 1,
+    'BREAKOUT': 1,
+    'NEAR_RESISTANCE': -1,
+    'NEAR_SUPPORT': 1,
+    'SHARP_INCREASE': 1,
+    'SHARP_DECREASE': -1,
+    'HIGH_VOLUME': 0,
+}
+
+
+def load_history(symbols: List[str], days: int) -> Dict[str, pd.DataFrame]:
+    """
+    读取历史日K线（优先使用本地K线存储），按日期对齐为 (日期 × 股票) 的收盘价和成交量表
+    :return: {'close': DataFrame, 'volume': DataFrame}
+    """
+    closes, volumes = {}, {}
+    for symbol, frame in data_provider.get_stock_data_many(symbols, period='daily', days=days):
+        if not frame.empty:
+            closes[symbol] = frame['close'].astype(float)
+            volumes[symbol] = frame['volume'].astype(float)
+    ordered = [symbol for symbol in symbols if symbol in closes]
+    close = pd.DataFrame(closes, columns=ordered).sort_index()
+    volume = pd.DataFrame(volumes, columns=ordered).reindex(close.index)
+    return {'close': close, 'volume': volume}
+
+
+def compute_series_features(close: pd.DataFrame, volume: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    计算每个交易日、每只股票的指标，口径与 compute_features / IndicatorEngine 一致
+    停牌日（收盘价为空）的K线数记为0，不会触发任何规则
+    :return: {指标名: (日期 × 股票) 数组}
+    """
+    valid = close.notna()
+    bars = valid.cumsum().where(valid, 0)
+
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(RSI_WINDOW).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(RSI_WINDOW).mean()
+    rsi = (100 - 100 / (1 + gain / loss)).where(bars >= RSI_WINDOW)
+
+    macd = close.ewm(span=MACD_FAST).mean() - close.ewm(span=MACD_SLOW).mean()
+    signal = macd.ewm(span=MACD_SIGNAL).mean()
+
+    prev_price = close.shift(1)
+    avg_volume = volume.rolling(AVERAGE_WINDOW).mean()
+
+    features = {
+        'price': close,
+        'prev_price': prev_price.where(prev_price.notna(), close),
+        'rsi': rsi,
+        'macd': macd,
+        'macd_signal': signal,
+        'macd_hist': macd - signal,
+        'high_20': close.rolling(BREAKOUT_LOOKBACK, min_periods=1).max(),
+        'resistance': close.rolling(SUPPORT_RESISTANCE_LOOKBACK, min_periods=1).max(),
+        'support': close.rolling(SUPPORT_RESISTANCE_LOOKBACK, min_periods=1).min(),
+        'avg_price_10': close.rolling(AVERAGE_WINDOW, min_periods=1).mean(),
+        'volume': volume,
+        'avg_volume_10': avg_volume,
+        'volume_ratio': volume / avg_volume,
+        'bars': bars,
+    }
+    return {name: values.to_numpy(dtype=float) for name, values in features.items()}
+
+
+def forward_returns(close: pd.DataFrame, horizon: int) -> np.ndarray:
+    """horizon个交易日后的收益率，最后horizon天为NaN"""
+    return (close.shift(-horizon) / close - 1).to_numpy(dtype=float)
+
+
+def signal_masks(symbols: List[str], features: Dict[str, np.ndarray], rules: RuleSet) -> Dict[str, np.ndarray]:
+    """按警报类型汇总规则命中的 (日期 × 股票) 布尔矩阵，同一类型的多条规则取并集"""
+    features = with_derived_features(features)
+    names = np.asarray(symbols)
+    masks = {}
+    for rule in rules.rules:
+        mask = rule.evaluate(features) & rule.scope(names)[np.newaxis, :]
+        masks[rule.type] = masks[rule.type] | mask if rule.type in masks else mask
+    return masks
+
+
+class _TypeStats:
+    """单类警报在某个持有期上的累计统计"""
+
+    def __init__(self):
+        self.signals = 0
+        self.return_sum = 0.0
+        self.hits = 0
+        self.positives = 0
+        self.observations = 0
+
+    def add(self, mask: np.ndarray, returns: np.ndarray, outcome: np.ndarray):
+        observed = ~np.isnan(returns)
+        fired = mask & observed
+        self.signals += int(fired.sum())
+        self.return_sum += float(returns[fired].sum())
+        self.hits += int((fired & outcome).sum())
+        self.positives += int((outcome & observed).sum())
+        self.observations += int(observed.sum())
+
+    def report(self) -> Dict:
+        return {
+            'signals': self.signals,
+            'mean_return': round(self.return_sum / self.signals, 6) if self.signals else None,
+            'precision': round(self.hits / self.signals, 4) if self.signals else None,
+            'recall': round(self.hits / self.positives, 4) if self.positives else None,
+            'base_rate': round(self.positives / self.observations, 4) if self.observations else None,
+        }
+
+
+def backtest(close: pd.DataFrame, volume: pd.DataFrame, rules: RuleSet = None,
+             horizons=HORIZONS, move_threshold: float = 0.02, chunk_symbols: int = CHUNK_SYMBOLS) -> Dict:
+    """
+    回测警报规则
+    某日收盘后触发警报、之后horizon个交易日的收益率沿预期方向超过move_threshold视为命中
+    （方向见 SIGNAL_DIRECTIONS）；mean_return 为警报之后的平均收益率：
+    - precision: 警报中命中的比例（与 base_rate 比较可看出信号是否有效）
+    - recall: 所有满足命中条件的样本中被警报覆盖的比例
+    - base_rate: 所有样本中满足命中条件的比例
+    :param close: (日期 × 股票) 收盘价
+    :param volume: (日期 × 股票) 成交量
+    :return: {警报类型: {持有期: 统计}}
+    """
+    rules = rules or alert_rules
+    stats = {}
+    symbols = list(close.columns)
+
+    for start in range(0, len(symbols), chunk_symbols):
+        chunk = symbols[start:start + chunk_symbols]
+        chunk_close = close[chunk]
+        masks = signal_masks(chunk, compute_series_features(chunk_close, volume[chunk]), rules)
+
+        for horizon in horizons:
+            returns = forward_returns(chunk_close, horizon)
+            with np.errstate(invalid='ignore'):
+                outcomes = {
+                    1: returns >= move_threshold,
+                    -1: returns <= -move_threshold,
+                    0: np.abs(returns) >= move_threshold,
+                }
+            for alert_type, mask in masks.items():
+                direction = SIGNAL_DIRECTIONS.get(alert_type, 0)
+                stats.setdefault(alert_type, {}).setdefault(horizon, _TypeStats()).add(
+                    mask, returns, outcomes[direction])
+
+    return {alert_type: {horizon: type_stats.report() for horizon, type_stats in by_horizon.items()}
+            for alert_type, by_horizon in stats.items()}
+
+
+def format_report(report: Dict, horizons=HORIZONS) -> str:
+    """格式化为文本表格"""
+    lines = [f"{'警报类型':<16}{'持有期':>6}{'次数':>10}{'平均收益':>10}{'精确率':>9}{'召回率':>9}{'基准':>9}"]
+    for alert_type, by_horizon in report.items():
+        for horizon in horizons:
+            row = by_horizon.get(horizon)
+            if row is None:
+                continue
+            mean_return = f"{row['mean_return'] * 100:+.2f}%" if row['mean_return'] is not None else '-'
+            precision = f"{row['precision'] * 100:.1f}%" if row['precision'] is not None else '-'
+            recall = f"{row['recall'] * 100:.1f}%" if row['recall'] is not None else '-'
+            base_rate = f"{row['base_rate'] * 100:.1f}%" if row['base_rate'] is not None else '-'
+            lines.append(f"{alert_type:<16}{horizon:>6}{row['signals']:>10}{mean_return:>10}"
+                         f"{precision:>9}{recall:>9}{base_rate:>9}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py backtest', description="回测风险监控警报")
+    parser.add_argument('--universe', default='watchlist',
+                        help='股票池：watchlist、example、all，或逗号分隔的股票代码')
+    parser.add_argument('--years', type=int, default=3, help='回测年数')
+    parser.add_argument('--move', type=float, default=0.02, help='视为命中的收益率阈值')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    history = load_history(load_universe(args.universe), days=args.years * 365)
+    loaded = time.time() - started
+    report = backtest(history['close'], history['volume'], move_threshold=args.move)
+    elapsed = time.time() - started - loaded
+
+    close = history['close']
+    print(f"{close.shape[1]} 只股票 x {close.shape[0]} 个交易日，加载 {loaded:.1f}秒，回测 {elapsed:.1f}秒")
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
@@ -0,0 +1,139 @@
+"""
+批量信号扫描模块
+将多只股票的K线右对齐成 (时间 × 股票) 的NumPy矩阵，一次向量化计算所有股票的
+RSI、突破、支撑阻力、价格偏离和量比，再由警报规则批量生成警报
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from monitoring.alert_rules import RuleSet, alert_rules
+from monitoring.indicators import (RSI_WINDOW, MACD_FAST, MACD_SLOW, MACD_SIGNAL, BREAKOUT_LOOKBACK,
+                                   SUPPORT_RESISTANCE_LOOKBACK, AVERAGE_WINDOW)
+
+
+def build_matrix(frames: Dict[str, pd.DataFrame], quotes: Dict[str, Dict] = None,
+                 today=None, max_rows: int = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    将多只股票的K线右对齐为矩阵，最后一行是各股票的最新K线，K线不足的部分以NaN填充
+    有实时报价的股票：today之前的K线视为已走完，报价作为最后一根K线（与 IndicatorEngine.sync 一致）
+    :param frames: {股票代码: 包含close/volume的K线}
+    :param quotes: {股票代码: 报价}，报价需包含price和volume
+    :param today: 当日日期，默认取当前日期
+    :param max_rows: 最多保留的K线数，None表示取最长的一只
+    :return: (股票代码列表, 收盘价矩阵, 成交量矩阵)
+    """
+    quotes = quotes or {}
+    today = pd.Timestamp(today) if today is not None else pd.Timestamp.now().normalize()
+
+    columns = []
+    for symbol, frame in frames.items():
+        quote = quotes.get(symbol)
+        closes = frame['close'].to_numpy(dtype=float) if not frame.empty else np.empty(0)
+        volumes = frame['volume'].to_numpy(dtype=float) if not frame.empty else np.empty(0)
+        if quote:
+            completed = int(frame.index.searchsorted(today)) if not frame.empty else 0
+            closes = np.append(closes[:completed], quote['price'])
+            volumes = np.append(volumes[:completed], quote['volume'])
+        if len(closes):
+            columns.append((symbol, closes, volumes))
+
+    symbols = [symbol for symbol, _, _ in columns]
+    rows = max((len(closes) for _, closes, _ in columns), default=0)
+    if max_rows is not None:
+        rows = min(rows, max_rows)
+
+    close = np.full((rows, len(columns)), np.nan)
+    volume = np.full((rows, len(columns)), np.nan)
+    for j, (_, closes, volumes) in enumerate(columns):
+        n = min(len(closes), rows)
+        if n:
+            close[rows - n:, j] = closes[-n:]
+            volume[rows - n:, j] = volumes[-n:]
+    return symbols, close, volume
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """逐行递推的EMA，各列从第一个有效值开始，与 pandas ewm(span=N, adjust=True) 一致"""
+    decay = 1 - 2 / (span + 1)
+    numerator = np.zeros(values.shape[1])
+    denominator = np.zeros(values.shape[1])
+    result = np.full(values.shape, np.nan)
+    for i in range(values.shape[0]):
+        row = values[i]
+        valid = ~np.isnan(row)
+        numerator = np.where(valid, np.nan_to_num(row) + decay * numerator, numerator)
+        denominator = np.where(valid, 1 + decay * denominator, denominator)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[i] = np.where(valid, numerator / denominator, np.nan)
+    return result
+
+
+def _tail(matrix: np.ndarray, window: int) -> np.ndarray:
+    return matrix[-window:] if matrix.shape[0] >= window else matrix
+
+
+def compute_features(close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    计算每只股票最新K线的指标，字段与 IndicatorEngine 的快照一致
+    :param close: 右对齐的收盘价矩阵 (时间 × 股票)
+    :param volume: 右对齐的成交量矩阵 (时间 × 股票)
+    :return: {指标名: 长度为股票数的数组}
+    """
+    rows, count = close.shape
+    bars = np.count_nonzero(~np.isnan(close), axis=0)
+    if rows == 0:
+        empty = np.full(count, np.nan)
+        return {name: empty.copy() for name in (
+            'price', 'prev_price', 'rsi', 'macd', 'macd_signal', 'macd_hist', 'high_20', 'resistance',
+            'support', 'avg_price_10', 'volume', 'avg_volume_10', 'volume_ratio')} | {'bars': bars}
+
+    price = close[-1]
+    prev_price = close[-2] if rows > 1 else np.full(count, np.nan)
+    prev_price = np.where(np.isnan(prev_price), price, prev_price)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 与 calculate_rsi 一致：第一根K线的涨跌记为0，窗口内需有RSI_WINDOW个值
+        delta = np.diff(close, axis=0, prepend=np.nan)
+        first_bar = np.isnan(np.vstack([np.full((1, count), np.nan), close[:-1]])) & ~np.isnan(close)
+        delta[first_bar] = 0.0
+        recent = _tail(delta, RSI_WINDOW)
+        avg_gain = np.clip(recent, 0, None).sum(axis=0) / RSI_WINDOW
+        avg_loss = np.clip(-recent, 0, None).sum(axis=0) / RSI_WINDOW
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        rsi = np.where(bars >= RSI_WINDOW, rsi, np.nan)
+
+        macd_line = _ema(close, MACD_FAST) - _ema(close, MACD_SLOW)
+        signal_line = _ema(macd_line, MACD_SIGNAL)
+
+        avg_volume = np.nanmean(_tail(volume, AVERAGE_WINDOW), axis=0)
+        avg_volume = np.where(bars >= AVERAGE_WINDOW, avg_volume, np.nan)
+
+        return {
+            'price': price,
+            'prev_price': prev_price,
+            'rsi': rsi,
+            'macd': macd_line[-1],
+            'macd_signal': signal_line[-1],
+            'macd_hist': macd_line[-1] - signal_line[-1],
+            'high_20': np.nanmax(_tail(close, BREAKOUT_LOOKBACK), axis=0),
+            'resistance': np.nanmax(_tail(close, SUPPORT_RESISTANCE_LOOKBACK), axis=0),
+            'support': np.nanmin(_tail(close, SUPPORT_RESISTANCE_LOOKBACK), axis=0),
+            'avg_price_10': np.nanmean(_tail(close, AVERAGE_WINDOW), axis=0),
+            'volume': volume[-1],
+            'avg_volume_10': avg_volume,
+            'volume_ratio': volume[-1] / avg_volume,
+            'bars': bars
+        }
+
+
+def scan_alerts(symbols: List[str], features: Dict[str, np.ndarray], rules: RuleSet = None) -> List[Dict]:
+    """
+    根据批量指标生成警报
+    :param symbols: 与指标数组对应的股票代码
+    :param features: compute_features 的结果
+    :param rules: 警报规则，默认使用全局规则
+    :return: 按股票顺序排列的警报列表
+    """
+    return (rules or alert_rules).evaluate(symbols, features)
@@ -0,0 +1,107 @@
+"""
+事件驱动监控模块
+轮询全市场快照，只对报价发生变化的股票运行检查；轮询间隔随行情活跃度自适应，
+非交易时段休眠到下一个交易时段，停止信号可立即唤醒
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from config.settings import MONITOR_MIN_INTERVAL, MONITOR_MAX_INTERVAL
+from data.data_provider import data_provider
+from data.trading_calendar import trading_calendar
+from monitoring.risk_monitor import risk_monitor, CycleDataContext
+
+logger = logging.getLogger(__name__)
+
+# 报价变化的股票占比达到该比例时视为行情活跃，缩短轮询间隔
+ACTIVE_CHANGE_RATIO = 0.5
+
+
+class EventDrivenMonitor:
+    """
+    事件驱动的盘中监控
+    - 有实时报价的股票：价格或成交量变化时才重新检查
+    - 没有实时报价的股票（如指数）：至少每隔 max_interval 秒检查一次
+    - 有新警报或多数股票报价变化时轮询间隔减半，没有任何变化时加倍
+    """
+
+    def __init__(self, monitor=None, provider=None, min_interval: float = MONITOR_MIN_INTERVAL,
+                 max_interval: float = MONITOR_MAX_INTERVAL):
+        self.monitor = monitor or risk_monitor
+        self.provider = provider or data_provider
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = self.min_interval
+        self._last_quotes = {}
+        self._last_checked = {}
+
+    def detect_changes(self, symbols: List[str], quotes: Dict[str, Dict], now: datetime) -> List[str]:
+        """找出需要重新检查的股票，不修改状态（检查成功后才由 run_cycle 记录）"""
+        due = []
+        for symbol in symbols:
+            quote = quotes.get(symbol)
+            if quote:
+                if self._last_quotes.get(symbol) != (quote['price'], quote['volume']):
+                    due.append(symbol)
+            else:
+                last_checked = self._last_checked.get(symbol)
+                if last_checked is None or (now - last_checked).total_seconds() >= self.max_interval:
+                    due.append(symbol)
+        return due
+
+    def adapt_interval(self, changed: int, total: int, alert_count: int) -> float:
+        """根据本轮变化和警报数量调整轮询间隔"""
+        if alert_count or (total and changed / total >= ACTIVE_CHANGE_RATIO):
+            self.interval = max(self.min_interval, self.interval / 2)
+        elif changed == 0:
+            self.interval = min(self.max_interval, self.interval * 2)
+        return self.interval
+
+    def run_cycle(self, symbols: List[str]) -> List[Dict]:
+        """
+        执行一轮：拉取快照、检测变化、只检查变化的股票
+        :return: 新产生的警报
+        """
+        context = CycleDataContext(self.provider)
+        quotes = context.get_quotes(symbols)
+        due = self.detect_changes(symbols, quotes, context.now)
+
+        alerts = self.monitor.monitor_stocks(due, context) if due else []
+        # 只记录拿到K线的股票，数据获取失败的股票下一轮重新检查
+        for symbol in due:
+            if context.get(symbol).empty:
+                continue
+            quote = quotes.get(symbol)
+            if quote:
+                self._last_quotes[symbol] = (quote['price'], quote['volume'])
+            self._last_checked[symbol] = context.now
+
+        self.adapt_interval(len(due), len(symbols), len(alerts))
+        logger.info(f"盘中监控: {len(due)}/{len(symbols)} 只股票有更新，{len(alerts)} 个新警报，"
+                    f"{self.interval:.0f}秒后再次检查")
+        return alerts
+
+    def run(self, get_symbols: Callable[[], List[str]], stop_event: threading.Event,
+            on_alert: Callable[[Dict], None]):
+        """
+        持续监控直到 stop_event 被设置
+        :param get_symbols: 返回当前监控列表的函数（监控列表可能在运行中被修改）
+        :param on_alert: 每个新警报的回调
+        """
+        while not stop_event.is_set():
+            now = self.provider.now()
+            if not trading_calendar.is_trading_session(now):
+                wake_at = trading_calendar.next_session_start(now)
+                logger.info(f"非交易时间，暂停实时监控，{wake_at.strftime('%Y-%m-%d %H:%M')} 恢复")
+                self.interval = self.min_interval
+                stop_event.wait(max((wake_at - now).total_seconds(), 1))
+                continue
+
+            try:
+                for alert in self.run_cycle(get_symbols()):
+                    on_alert(alert)
+            except Exception as e:
+                logger.error(f"盘中监控出错: {str(e)}")
+            stop_event.wait(self.interval)
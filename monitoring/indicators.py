@@ -0,0 +1,287 @@
+"""
+流式指标模块
+按股票保存RSI、MACD、滚动均值和极值的中间状态，每根新K线以常数时间更新，
+并支持对尚未走完的当前K线做"假设更新"（不修改状态）
+计算口径与 RiskMonitor.calculate_rsi / calculate_macd 及各项检查保持一致
+"""
+import math
+from collections import deque
+from typing import Dict, Optional
+
+import pandas as pd
+
+# 指标窗口
+RSI_WINDOW = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BREAKOUT_LOOKBACK = 20
+SUPPORT_RESISTANCE_LOOKBACK = 30
+AVERAGE_WINDOW = 10
+
+# 滚动求和的浮点误差容忍度
+EPSILON = 1e-9
+
+NAN = float('nan')
+
+
+class RollingSum:
+    """固定窗口滚动求和"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+
+    def push(self, value: float):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        if abs(self.total) < EPSILON:
+            self.total = 0.0
+
+    def peek_mean(self, value: float, partial: bool = False) -> float:
+        """
+        假设再加入value后的窗口均值
+        :param partial: 窗口不满时是否按已有数据求均值，否则返回NaN
+        """
+        if len(self.values) < self.window - 1:
+            return (self.total + value) / (len(self.values) + 1) if partial else NAN
+        total = self.total + value
+        if len(self.values) == self.window:
+            total -= self.values[0]
+        return total / self.window
+
+
+class RollingExtreme:
+    """单调队列维护的滚动最大值（或最小值）"""
+
+    def __init__(self, window: int, use_max: bool = True):
+        self.window = window
+        self.use_max = use_max
+        self.items = deque()  # (序号, 值)，值单调
+        self.count = 0
+
+    def _dominates(self, a: float, b: float) -> bool:
+        return a >= b if self.use_max else a <= b
+
+    def push(self, value: float):
+        while self.items and self._dominates(value, self.items[-1][1]):
+            self.items.pop()
+        self.items.append((self.count, value))
+        self.count += 1
+        while self.items[0][0] <= self.count - 1 - self.window:
+            self.items.popleft()
+
+    def peek(self, value: float) -> float:
+        """假设再加入value后窗口内的极值（窗口不足时取已有数据）"""
+        oldest_valid = self.count + 1 - self.window
+        for index, existing in self.items:
+            if index >= oldest_valid:
+                return existing if self._dominates(existing, value) else value
+        return value
+
+
+class AdjustedEMA:
+    """与 pandas ewm(span=N, adjust=True).mean() 一致的递推EMA"""
+
+    def __init__(self, span: int):
+        self.decay = 1 - 2 / (span + 1)
+        self.numerator = 0.0
+        self.denominator = 0.0
+
+    def push(self, value: float) -> float:
+        self.numerator = value + self.decay * self.numerator
+        self.denominator = 1 + self.decay * self.denominator
+        return self.numerator / self.denominator
+
+    def peek(self, value: float) -> float:
+        return (value + self.decay * self.numerator) / (1 + self.decay * self.denominator)
+
+
+class StreamingRSI:
+    """
+    流式RSI
+    smoothing='sma' 与 calculate_rsi 的简单滚动均值一致；'wilder' 为Wilder平滑
+    """
+
+    def __init__(self, window: int = RSI_WINDOW, smoothing: str = 'sma'):
+        if smoothing not in ('sma', 'wilder'):
+            raise ValueError(f"Unsupported RSI smoothing: {smoothing}")
+        self.window = window
+        self.smoothing = smoothing
+        self.gains = RollingSum(window)
+        self.losses = RollingSum(window)
+        self.avg_gain = None
+        self.avg_loss = None
+        self.deltas = 0
+
+    @staticmethod
+    def _rsi(avg_gain: float, avg_loss: float) -> float:
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            return NAN
+        if avg_loss == 0:
+            return NAN if avg_gain == 0 else 100.0
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def _wilder_step(self, avg: float, value: float) -> float:
+        return (avg * (self.window - 1) + value) / self.window
+
+    def push(self, delta: float):
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        self.deltas += 1
+        if self.smoothing == 'wilder':
+            if self.deltas < self.window:
+                self.gains.push(gain)
+                self.losses.push(loss)
+            elif self.deltas == self.window:
+                self.gains.push(gain)
+                self.losses.push(loss)
+                self.avg_gain = self.gains.total / self.window
+                self.avg_loss = self.losses.total / self.window
+            else:
+                self.avg_gain = self._wilder_step(self.avg_gain, gain)
+                self.avg_loss = self._wilder_step(self.avg_loss, loss)
+            return
+        self.gains.push(gain)
+        self.losses.push(loss)
+
+    def peek(self, delta: float) -> float:
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.smoothing == 'wilder':
+            if self.avg_gain is None:
+                return self._rsi(self.gains.peek_mean(gain), self.losses.peek_mean(loss))
+            return self._rsi(self._wilder_step(self.avg_gain, gain), self._wilder_step(self.avg_loss, loss))
+        return self._rsi(self.gains.peek_mean(gain), self.losses.peek_mean(loss))
+
+
+class SymbolIndicators:
+    """单只股票的指标状态"""
+
+    def __init__(self, rsi_smoothing: str = 'sma'):
+        self.rsi = StreamingRSI(smoothing=rsi_smoothing)
+        self.ema_fast = AdjustedEMA(MACD_FAST)
+        self.ema_slow = AdjustedEMA(MACD_SLOW)
+        self.macd_signal = AdjustedEMA(MACD_SIGNAL)
+        self.high_breakout = RollingExtreme(BREAKOUT_LOOKBACK, use_max=True)
+        self.resistance = RollingExtreme(SUPPORT_RESISTANCE_LOOKBACK, use_max=True)
+        self.support = RollingExtreme(SUPPORT_RESISTANCE_LOOKBACK, use_max=False)
+        self.closes = RollingSum(AVERAGE_WINDOW)
+        self.volumes = RollingSum(AVERAGE_WINDOW)
+        self.last_close = None
+        self.last_timestamp = None
+        self.bars = 0
+
+    def update(self, timestamp, close: float, volume: float):
+        """提交一根已走完的K线"""
+        # 与calculate_rsi一致，第一根K线的涨跌记为0
+        self.rsi.push(close - self.last_close if self.last_close is not None else 0.0)
+        macd = self.ema_fast.push(close) - self.ema_slow.push(close)
+        self.macd_signal.push(macd)
+        self.high_breakout.push(close)
+        self.resistance.push(close)
+        self.support.push(close)
+        self.closes.push(close)
+        self.volumes.push(volume)
+        self.last_close = close
+        self.last_timestamp = timestamp
+        self.bars += 1
+
+    def peek(self, close: float, volume: float) -> Dict[str, float]:
+        """
+        假设当前K线以close/volume结束时的指标快照，不修改状态
+        """
+        rsi = self.rsi.peek(close - self.last_close if self.last_close is not None else 0.0)
+        macd = self.ema_fast.peek(close) - self.ema_slow.peek(close)
+        signal = self.macd_signal.peek(macd)
+        avg_volume = self.volumes.peek_mean(volume)
+        return {
+            "price": close,
+            "prev_price": self.last_close if self.last_close is not None else close,
+            "rsi": rsi,
+            "macd": macd,
+            "macd_signal": signal,
+            "macd_hist": macd - signal,
+            "high_20": self.high_breakout.peek(close),
+            "resistance": self.resistance.peek(close),
+            "support": self.support.peek(close),
+            "avg_price_10": self.closes.peek_mean(close, partial=True),
+            "volume": volume,
+            "avg_volume_10": avg_volume,
+            "volume_ratio": volume / avg_volume if avg_volume and avg_volume > 0 else NAN,
+            "bars": self.bars + 1
+        }
+
+
+class IndicatorEngine:
+    """
+    流式指标引擎
+    每只股票保存一份 SymbolIndicators，已走完的K线只提交一次，当前K线通过 peek 计算
+    """
+
+    def __init__(self, rsi_smoothing: str = 'sma'):
+        self.rsi_smoothing = rsi_smoothing
+        self._states = {}
+
+    def reset(self, symbol: str = None):
+        """清除某只股票（或全部）的状态"""
+        if symbol is None:
+            self._states.clear()
+        else:
+            self._states.pop(symbol, None)
+
+    def update(self, symbol: str, timestamp, close: float, volume: float):
+        """提交一根已走完的K线"""
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = SymbolIndicators(self.rsi_smoothing)
+        state.update(timestamp, close, volume)
+
+    def peek(self, symbol: str, close: float, volume: float) -> Optional[Dict[str, float]]:
+        """当前K线的假设更新，股票尚无状态时返回None"""
+        state = self._states.get(symbol)
+        if state is None:
+            return None
+        return state.peek(close, volume)
+
+    def sync(self, symbol: str, bars: pd.DataFrame, current_price: float = None,
+             current_volume: float = None, today=None) -> Optional[Dict[str, float]]:
+        """
+        用K线同步状态并返回当前快照
+        - 有实时报价时：today之前的K线视为已走完，实时报价作为当前K线
+        - 无实时报价时：最后一根K线视为当前K线，其余视为已走完
+        已提交过的K线不会重复计算；历史不连续（如状态过旧）时从bars重建
+        :param bars: 以时间为索引、包含close/volume的K线
+        :param today: 当日日期，用于区分已走完的K线，默认取当前日期
+        :return: 指标快照，数据不足时返回None
+        """
+        if bars.empty and current_price is None:
+            return None
+
+        if current_price is not None:
+            today = pd.Timestamp(today) if today is not None else pd.Timestamp.now().normalize()
+            completed = bars[bars.index < today]
+            if current_volume is None:
+                current_volume = bars['volume'].iloc[-1] if not bars.empty and bars.index[-1] >= today else NAN
+        else:
+            completed = bars.iloc[:-1]
+            current_price = bars['close'].iloc[-1]
+            current_volume = bars['volume'].iloc[-1]
+
+        state = self._states.get(symbol)
+        if state is not None and state.last_timestamp is not None and not completed.empty:
+            if state.last_timestamp not in completed.index or state.last_timestamp > completed.index[-1]:
+                # 状态与K线对不上，从头重建
+                self.reset(symbol)
+                state = None
+        if state is None:
+            state = self._states[symbol] = SymbolIndicators(self.rsi_smoothing)
+
+        if state.last_timestamp is not None:
+            completed = completed[completed.index > state.last_timestamp]
+        for timestamp, close, volume in zip(completed.index, completed['close'].to_numpy(),
+                                            completed['volume'].to_numpy()):
+            state.update(timestamp, float(close), float(volume))
+
+        return state.peek(float(current_price), float(current_volume))
@@ -0,0 +1,221 @@
+"""
+全市场扫描模块
+每轮用一次全市场快照、按日缓存的历史K线矩阵和批量指标计算扫描全部A股，
+记录各阶段耗时并报告瓶颈阶段
+"""
+import time
+import argparse
+import logging
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (MARKET_SCAN_INTERVAL, MARKET_SCAN_CYCLE_TARGET, MARKET_SCAN_FETCH_LIMIT,
+                             MARKET_SCAN_HISTORY_RETRIES)
+from data.data_provider import data_provider
+from data.trading_calendar import trading_calendar
+from monitoring.batch_scan import build_matrix, scan_alerts
+from monitoring.parallel_scan import feature_pool
+from monitoring.risk_monitor import risk_monitor, TECHNICAL_LOOKBACK_DAYS
+from notification.notification_service import notification_service
+
+logger = logging.getLogger(__name__)
+
+
+class MarketScanner:
+    """
+    全市场扫描器
+    已走完的历史K线每个交易日只加载一次并对齐成矩阵，盘中每轮只需拉取一次快照，
+    把快照作为最后一行拼到矩阵上即可批量计算全部股票的信号
+    历史K线优先从本地K线存储读取；获取失败的股票在之后的轮次重试，每天最多 history_retries 次
+    """
+
+    def __init__(self, provider=None, monitor=None, history_days: int = TECHNICAL_LOOKBACK_DAYS,
+                 cycle_target: float = MARKET_SCAN_CYCLE_TARGET, fetch_limit: int = MARKET_SCAN_FETCH_LIMIT,
+                 history_retries: int = MARKET_SCAN_HISTORY_RETRIES):
+        self.provider = provider or data_provider
+        self.monitor = monitor or risk_monitor
+        self.history_days = history_days
+        self.cycle_target = cycle_target
+        self.fetch_limit = fetch_limit
+        self.history_retries = history_retries
+        self._history_date = None
+        self._history_symbols = []
+        self._history_columns = {}
+        self._history_close = np.empty((0, 0))
+        self._history_volume = np.empty((0, 0))
+        # 当天历史K线获取失败的次数
+        self._failures = {}
+        self.last_report = None
+
+    def _load_history(self, symbols: List[str], today) -> int:
+        """
+        加载当日尚未加载的股票的历史K线（只保留today之前已走完的K线），追加到历史矩阵
+        :return: 新加载的股票数
+        """
+        if self._history_date != today:
+            self._history_date = today
+            self._history_symbols = []
+            self._history_columns = {}
+            self._history_close = np.empty((0, 0))
+            self._history_volume = np.empty((0, 0))
+            self._failures = {}
+
+        pending = [symbol for symbol in symbols if symbol not in self._history_columns
+                   and self._failures.get(symbol, 0) < self.history_retries]
+        if not pending:
+            return 0
+
+        frames = {}
+        history = self.provider.get_daily_history(pending, today - timedelta(days=self.history_days), today,
+                                                  fetch_limit=self.fetch_limit)
+        for symbol, frame in history.items():
+            if frame.empty:
+                self._failures[symbol] = self._failures.get(symbol, 0) + 1
+            else:
+                frames[symbol] = frame
+
+        names, close, volume = build_matrix(frames, today=today)
+        for symbol in set(frames) - set(names):
+            self._failures[symbol] = self._failures.get(symbol, 0) + 1
+        if not names:
+            return 0
+
+        # 新旧矩阵行数不同时在顶部补NaN，保持右对齐
+        rows = max(self._history_close.shape[0], close.shape[0])
+        old_close, old_volume = self._pad(self._history_close, rows), self._pad(self._history_volume, rows)
+        self._history_close = np.hstack([old_close, self._pad(close, rows)])
+        self._history_volume = np.hstack([old_volume, self._pad(volume, rows)])
+        for name in names:
+            self._history_columns[name] = len(self._history_symbols)
+            self._history_symbols.append(name)
+        return len(names)
+
+    @staticmethod
+    def _pad(matrix: np.ndarray, rows: int) -> np.ndarray:
+        if matrix.shape[0] == rows:
+            return matrix
+        padding = np.full((rows - matrix.shape[0], matrix.shape[1]), np.nan)
+        return np.vstack([padding, matrix])
+
+    def _assemble(self, symbols: List[str], snapshot: pd.DataFrame) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        把快照作为最后一行拼接到历史矩阵上
+        历史矩阵各列已右对齐，没有历史的股票（如新股）只有快照这一行
+        """
+        price = snapshot['price'].to_numpy(dtype=float)
+        volume = snapshot['volume'].to_numpy(dtype=float)
+        columns = np.array([self._history_columns.get(symbol, -1) for symbol in symbols])
+
+        rows = self._history_close.shape[0]
+        close_matrix = np.full((rows + 1, len(symbols)), np.nan)
+        volume_matrix = np.full((rows + 1, len(symbols)), np.nan)
+        known = columns >= 0
+        if rows and known.any():
+            close_matrix[:rows, known] = self._history_close[:, columns[known]]
+            volume_matrix[:rows, known] = self._history_volume[:, columns[known]]
+        close_matrix[rows] = price
+        volume_matrix[rows] = volume
+
+        return symbols, close_matrix, volume_matrix
+
+    def scan(self) -> Dict:
+        """
+        执行一轮全市场扫描
+        :return: {'alerts': 新警报, 'symbols': 扫描股票数, 'timings': 各阶段耗时, 'total': 总耗时,
+                  'bottleneck': 最慢阶段, 'within_target': 是否达到耗时目标}
+        """
+        timings = {}
+        started = time.perf_counter()
+
+        snapshot = self.provider.get_market_snapshot()
+        timings['snapshot'] = time.perf_counter() - started
+        if snapshot.empty:
+            # 数据源不可用（或回放模式没有全市场快照）时跳过本轮
+            logger.warning("全市场快照为空，数据源不可用，跳过本轮扫描")
+            total = time.perf_counter() - started
+            self.last_report = {'symbols': 0, 'history_loaded': 0,
+                                'timings': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+                                'total': round(total, 3), 'bottleneck': 'snapshot', 'within_target': True}
+            return dict(self.last_report, alerts=[])
+        snapshot = snapshot[snapshot['price'].notna() & (snapshot['price'] > 0)]
+        symbols = list(snapshot.index)
+
+        stage_start = time.perf_counter()
+        today = self.provider.now().date()
+        loaded = self._load_history(symbols, today)
+        timings['history'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        names, close, volume = self._assemble(symbols, snapshot)
+        timings['matrix'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        features = feature_pool.compute(close, volume)
+        timings['features'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        alerts = self.monitor._record_alerts(scan_alerts(names, features))
+        timings['alerts'] = time.perf_counter() - stage_start
+
+        total = time.perf_counter() - started
+        bottleneck = max(timings, key=timings.get)
+        report = {
+            'alerts': alerts,
+            'symbols': len(names),
+            'history_loaded': loaded,
+            'timings': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+            'total': round(total, 3),
+            'bottleneck': bottleneck,
+            'within_target': total <= self.cycle_target
+        }
+        self.last_report = {key: value for key, value in report.items() if key != 'alerts'}
+
+        message = (f"全市场扫描 {len(names)} 只股票，{len(alerts)} 个新警报，耗时 {total:.2f}秒"
+                   f"（瓶颈: {bottleneck} {timings[bottleneck]:.2f}秒）")
+        if total > self.cycle_target:
+            logger.warning(f"{message}，超过目标 {self.cycle_target:.0f}秒")
+        else:
+            logger.info(message)
+        return report
+
+    def run(self, interval: int = MARKET_SCAN_INTERVAL, once: bool = False, notify: bool = False):
+        """
+        循环扫描，非交易时段休眠到下一个交易时段
+        :param notify: 是否推送高风险等级的警报
+        """
+        while True:
+            now = self.provider.now()
+            if once or trading_calendar.is_trading_session(now):
+                started = time.monotonic()
+                try:
+                    report = self.scan()
+                    if notify:
+                        for alert in report['alerts']:
+                            if alert['severity'] == 'high':
+                                notification_service.send_alert_notification(alert)
+                except Exception as e:
+                    logger.error(f"全市场扫描失败: {str(e)}")
+                if once:
+                    return
+                time.sleep(max(interval - (time.monotonic() - started), 0))
+            else:
+                wait = (trading_calendar.next_session_start(now) - now).total_seconds()
+                logger.info(f"非交易时间，{wait / 60:.0f}分钟后开始扫描")
+                time.sleep(max(wait, 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py scan', description="全市场信号扫描")
+    parser.add_argument('--interval', type=int, default=MARKET_SCAN_INTERVAL, help='扫描间隔（秒）')
+    parser.add_argument('--once', action='store_true', help='只扫描一轮（不检查交易时段）')
+    parser.add_argument('--notify', action='store_true', help='推送高风险等级的警报')
+    args = parser.parse_args(argv)
+    market_scanner.run(interval=args.interval, once=args.once, notify=args.notify)
+    return market_scanner.last_report
+
+
+# 全局全市场扫描实例
+market_scanner = MarketScanner()
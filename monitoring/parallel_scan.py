@@ -0,0 +1,101 @@
+"""
+多进程指标计算模块
+收盘价和成交量矩阵放入共享内存，按股票（列）切分给进程池计算，结果按分片顺序合并，
+不需要在进程间序列化DataFrame
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config.settings import PROCESS_POOL_WORKERS, PROCESS_POOL_MIN_SYMBOLS
+from monitoring.batch_scan import compute_features
+
+logger = logging.getLogger(__name__)
+
+
+def _compute_shard(shm_name: str, shape: Tuple[int, int], start: int, stop: int) -> Dict[str, np.ndarray]:
+    """子进程：挂载共享内存，计算 [start, stop) 列的指标"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matrices = np.ndarray((2,) + shape, dtype=np.float64, buffer=shm.buf)
+        features = compute_features(matrices[0, :, start:stop], matrices[1, :, start:stop])
+        # 部分指标是共享内存的视图，关闭共享内存前需要复制出来
+        result = {name: np.array(values, copy=True) for name, values in features.items()}
+        del features, matrices
+        return result
+    finally:
+        shm.close()
+
+
+def shard_bounds(count: int, shards: int) -> List[Tuple[int, int]]:
+    """把 count 列尽量均匀地切成 shards 段"""
+    shards = max(1, min(shards, count))
+    edges = np.linspace(0, count, shards + 1).astype(int)
+    return [(int(edges[i]), int(edges[i + 1])) for i in range(shards)]
+
+
+class FeaturePool:
+    """
+    指标计算进程池
+    股票数达到 min_symbols 且 workers 大于1时多进程计算，否则在当前进程计算；workers 为0时取CPU核数
+    进程池首次使用时创建并复用，子进程以spawn方式启动，避免复制监控线程的锁状态
+    """
+
+    def __init__(self, workers: int = PROCESS_POOL_WORKERS, min_symbols: int = PROCESS_POOL_MIN_SYMBOLS):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.min_symbols = min_symbols
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def compute(self, close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        计算每只股票最新K线的指标，结果与 compute_features 完全一致
+        """
+        count = close.shape[1]
+        if self.workers <= 1 or count < self.min_symbols:
+            return compute_features(close, volume)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(2 * close.size * 8, 1))
+        matrices = None
+        try:
+            matrices = np.ndarray((2,) + close.shape, dtype=np.float64, buffer=shm.buf)
+            matrices[0] = close
+            matrices[1] = volume
+
+            executor = self._get_executor()
+            futures = [executor.submit(_compute_shard, shm.name, close.shape, start, stop)
+                       for start, stop in shard_bounds(count, self.workers)]
+            # 按分片顺序合并，保证结果与单进程一致
+            shards = [future.result() for future in futures]
+        except Exception as e:
+            logger.error(f"Error computing features in process pool, falling back to single process: {str(e)}")
+            return compute_features(close, volume)
+        finally:
+            del matrices
+            shm.close()
+            shm.unlink()
+
+        return {name: np.concatenate([shard[name] for shard in shards]) for name in shards[0]}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+# 全局指标计算进程池
+feature_pool = FeaturePool()
@@ -7,18 +7,82 @@ import numpy as np
 from datetime import datetime, timedelta
 import logging
 import time
+from collections import deque
 from typing import Dict, List
 
 from data.data_provider import data_provider
+from monitoring.indicators import IndicatorEngine
+from monitoring.batch_scan import build_matrix, scan_alerts
+from monitoring.parallel_scan import feature_pool
+from monitoring.alert_rules import alert_rules, stack_features
+from monitoring.alert_store import AlertStore
 from analysis.ai_analyzer import ai_analyzer
-from config.settings import RSI_OVERBOUGHT, RSI_OVERSOLD, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
+from config.settings import (STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT, BREAKOUT_FACTOR,
+                             SUPPORT_RESISTANCE_PROXIMITY, BATCH_SCAN_MIN_SYMBOLS, ALERT_COOLDOWN_SECONDS,
+                             ALERT_HISTORY_SIZE, ALERT_STORE_ENABLED, ALERT_STORE_PATH)
 
 logger = logging.getLogger(__name__)
 
+# 各项检查使用的数据窗口（自然日）
+TECHNICAL_LOOKBACK_DAYS = 60
+PRICE_LOOKBACK_DAYS = 30
+VOLUME_LOOKBACK_DAYS = 30
+
+class CycleDataContext:
+    """
+    单轮监控的数据上下文
+    每只股票只按最宽窗口拉取一次数据，各项检查从中切取所需的时间段
+    """
+    def __init__(self, provider=None, days: int = TECHNICAL_LOOKBACK_DAYS):
+        self.provider = provider or data_provider
+        self.days = days
+        self.now = self.provider.now()
+        self._frames = {}
+        self._quotes = None
+
+    def get(self, symbol: str, days: int = None) -> pd.DataFrame:
+        """
+        获取股票数据切片
+        :param symbol: 股票代码
+        :param days: 最近多少个自然日，None表示整个窗口
+        :return: DataFrame
+        """
+        if symbol not in self._frames:
+            self._frames[symbol] = self.provider.get_stock_data(symbol, period='daily', days=self.days)
+
+        frame = self._frames[symbol]
+        if days is None or frame.empty:
+            return frame
+
+        start = pd.Timestamp((self.now - timedelta(days=days)).date())
+        return frame[frame.index >= start]
+
+    def prefetch(self, symbols: List[str]):
+        """并发拉取尚未获取的股票数据"""
+        pending = [symbol for symbol in symbols if symbol not in self._frames]
+        for symbol, frame in self.provider.get_stock_data_many(pending, period='daily', days=self.days):
+            self._frames[symbol] = frame
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
+        """获取本轮的实时报价，整轮只请求一次全市场快照"""
+        if self._quotes is None:
+            self._quotes = self.provider.get_quotes(symbols)
+        return self._quotes
+
 class RiskMonitor:
-    def __init__(self):
-        self.alerts = []
+    def __init__(self, cooldown_seconds: int = ALERT_COOLDOWN_SECONDS, history_size: int = ALERT_HISTORY_SIZE,
+                 store: AlertStore = None):
+        # 最近的警报，超过容量时自动丢弃最早的
+        self.alerts = deque(maxlen=history_size)
+        # 警报持久化存储，为空时只保存在内存中
+        self.store = store
         self.last_check_times = {}
+        # (股票代码, 警报类型) -> 最近一次发出的时间，用于去重
+        self.cooldown = timedelta(seconds=cooldown_seconds)
+        self._last_fired = {}
+        self._prune_threshold = history_size
+        # 流式指标状态，跨监控轮次保留，已走完的K线只计算一次
+        self.indicators = IndicatorEngine()
     
     def calculate_rsi(self, prices: pd.Series, window: int = 14) -> pd.Series:
         """计算RSI指标"""
@@ -45,7 +109,7 @@ class RiskMonitor:
         previous_price = prices.iloc[-2] if len(prices) > 1 else current_price
         
         # 检查是否向上突破
-        if current_price > recent_high * 0.995 and previous_price <= recent_high * 0.995:
+        if current_price > recent_high * BREAKOUT_FACTOR and previous_price <= recent_high * BREAKOUT_FACTOR:
             return True
         return False
     
@@ -60,176 +124,136 @@ class RiskMonitor:
         return {
             "resistance": resistance,
             "support": support,
-            "is_near_resistance": abs(current_price - resistance) / resistance < 0.02,  # 2%以内
-            "is_near_support": abs(current_price - support) / support < 0.02
+            "is_near_resistance": abs(current_price - resistance) / resistance < SUPPORT_RESISTANCE_PROXIMITY,
+            "is_near_support": abs(current_price - support) / support < SUPPORT_RESISTANCE_PROXIMITY
         }
     
-    def check_technical_signals(self, symbol: str) -> List[Dict]:
-        """检查技术指标信号"""
-        alerts = []
-        
-        try:
-            # 获取数据
-            stock_data = data_provider.get_stock_data(symbol, period='daily', days=60)
-            if stock_data.empty or len(stock_data) < 30:
-                return alerts
-            
-            prices = stock_data['close']
-            
-            # 计算技术指标
-            rsi = self.calculate_rsi(prices)
-            current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else None
-            
-            # RSI信号
-            if current_rsi is not None:
-                if current_rsi > RSI_OVERBOUGHT:
-                    alerts.append({
-                        "type": "OVERBOUGHT",
-                        "symbol": symbol,
-                        "message": f"RSI超买信号: {current_rsi:.2f}",
-                        "severity": "medium",
-                        "timestamp": datetime.now().isoformat()
-                    })
-                elif current_rsi < RSI_OVERSOLD:
-                    alerts.append({
-                        "type": "OVERSOLD",
-                        "symbol": symbol,
-                        "message": f"RSI超卖信号: {current_rsi:.2f}",
-                        "severity": "medium",
-                        "timestamp": datetime.now().isoformat()
-                    })
-            
-            # 突破信号
-            if self.detect_breakout(prices):
-                alerts.append({
-                    "type": "BREAKOUT",
-                    "symbol": symbol,
-                    "message": f"价格突破信号: {prices.iloc[-1]:.2f}",
-                    "severity": "high",
-                    "timestamp": datetime.now().isoformat()
-                })
+    def scan_batch(self, symbols: List[str], context: CycleDataContext) -> List[Dict]:
+        """
+        批量扫描：所有股票对齐成矩阵后一次性计算指标并生成警报
+        :return: 按股票顺序排列的候选警报（未去重）
+        """
+        quotes = context.get_quotes(symbols)
+        context.prefetch(symbols)
+        frames = {symbol: context.get(symbol, days=TECHNICAL_LOOKBACK_DAYS) for symbol in symbols}
+        names, close, volume = build_matrix(frames, quotes, today=context.now.date())
+        return scan_alerts(names, feature_pool.compute(close, volume))
+    
+    def _record_alerts(self, candidates: List[Dict]) -> List[Dict]:
+        """过滤冷却期内的重复警报并记录，返回新产生的警报"""
+        new_alerts = []
+        for alert in candidates:
+            key = (alert['symbol'], alert['type'])
+            fired_at = datetime.fromisoformat(alert['timestamp'])
+            last_fired = self._last_fired.get(key)
+            # 同一股票同类警报在冷却期内只推送一次（避免频繁推送）
+            if last_fired is not None and abs(fired_at - last_fired) < self.cooldown:
+                continue
             
-            # 支撑阻力位
-            sr_levels = self.detect_support_resistance(prices)
-            if sr_levels["is_near_resistance"]:
-                alerts.append({
-                    "type": "NEAR_RESISTANCE",
-                    "symbol": symbol,
-                    "message": f"价格接近阻力位: {sr_levels['resistance']:.2f}",
-                    "severity": "low",
-                    "timestamp": datetime.now().isoformat()
-                })
-            elif sr_levels["is_near_support"]:
-                alerts.append({
-                    "type": "NEAR_SUPPORT",
-                    "symbol": symbol,
-                    "message": f"价格接近支撑位: {sr_levels['support']:.2f}",
-                    "severity": "low",
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-        except Exception as e:
-            logger.error(f"Error checking technical signals for {symbol}: {str(e)}")
+            self._last_fired[key] = fired_at
+            new_alerts.append(alert)
+            self.alerts.append(alert)
         
-        return alerts
+        if len(self._last_fired) > self._prune_threshold:
+            self._prune_last_fired()
+        if self.store is not None and new_alerts:
+            try:
+                self.store.add_many(new_alerts)
+            except Exception as e:
+                logger.error(f"Error saving alerts: {str(e)}")
+        return new_alerts
+    
+    def _prune_last_fired(self):
+        """清理已过冷却期的去重记录，保持内存占用稳定"""
+        expire_before = datetime.now() - self.cooldown
+        self._last_fired = {key: fired_at for key, fired_at in self._last_fired.items()
+                            if fired_at >= expire_before}
+        self._prune_threshold = max(self.alerts.maxlen or 0, 2 * len(self._last_fired))
     
-    def check_price_alerts(self, symbol: str, current_price: float, threshold_percent: float = 2.0) -> List[Dict]:
-        """检查价格预警"""
-        alerts = []
+    def query_alerts(self, since: str = None, until: str = None, symbol: str = None, alert_type: str = None,
+                     severity: str = None, cursor: int = None, limit: int = 50):
+        """
+        查询警报，启用持久化存储时走索引查询，否则在内存中的最近警报里筛选
+        :return: (按时间先后排列的警报列表, 下一页游标)
+        """
+        if self.store is not None:
+            return self.store.query(since=since, until=until, symbol=symbol, alert_type=alert_type,
+                                    severity=severity, cursor=cursor, limit=limit)
         
-        try:
-            # 获取历史数据计算均价
-            stock_data = data_provider.get_stock_data(symbol, period='daily', days=30)
-            if not stock_data.empty:
-                avg_price = stock_data['close'].tail(10).mean()
-                
-                # 计算涨跌幅
-                change_percent = ((current_price - avg_price) / avg_price) * 100
-                
-                if abs(change_percent) >= threshold_percent:
-                    alert_type = "SHARP_INCREASE" if change_percent > 0 else "SHARP_DECREASE"
-                    severity = "high" if abs(change_percent) >= 5.0 else "medium"
-                    
-                    alerts.append({
-                        "type": alert_type,
-                        "symbol": symbol,
-                        "message": f"价格异动: {change_percent:+.2f}% (当前价: {current_price:.2f})",
-                        "severity": severity,
-                        "timestamp": datetime.now().isoformat()
-                    })
-        except Exception as e:
-            logger.error(f"Error checking price alerts for {symbol}: {str(e)}")
+        matched = [alert for alert in self.alerts
+                   if (not since or alert['timestamp'] >= since) and (not until or alert['timestamp'] < until)
+                   and (not symbol or alert['symbol'] == symbol) and (not alert_type or alert['type'] == alert_type)
+                   and (not severity or alert['severity'] == severity)]
+        return matched[-limit:] if limit > 0 else [], None
+    
+    def summarize_alerts(self, since: str = None, until: str = None) -> Dict[str, int]:
+        """按风险等级统计警报数量"""
+        if self.store is not None:
+            return self.store.summary(since=since, until=until)
         
-        return alerts
+        counts = {}
+        for alert in self.alerts:
+            if (not since or alert['timestamp'] >= since) and (not until or alert['timestamp'] < until):
+                counts[alert['severity']] = counts.get(alert['severity'], 0) + 1
+        return counts
     
-    def check_volume_anomalies(self, symbol: str) -> List[Dict]:
-        """检查成交量异常"""
-        alerts = []
+    def monitor_stocks(self, symbols: List[str], context: CycleDataContext = None) -> List[Dict]:
+        """
+        监控股票列表的风险和机会
+        股票数达到 BATCH_SCAN_MIN_SYMBOLS 时使用批量扫描，否则逐只使用流式指标检查
+        :param symbols: 股票代码列表
+        :param context: 本轮数据上下文，为空时新建，每只股票只拉取一次数据
+        :return: 新产生的警报列表
+        """
+        context = context or CycleDataContext()
         
-        try:
-            stock_data = data_provider.get_stock_data(symbol, period='daily', days=30)
-            if stock_data.empty or len(stock_data) < 10:
-                return alerts
-            
-            volumes = stock_data['volume']
-            avg_volume = volumes.rolling(window=10).mean().iloc[-1]
-            current_volume = volumes.iloc[-1]
-            
-            if avg_volume > 0:
-                volume_ratio = current_volume / avg_volume
-                if volume_ratio >= 2.0:  # 成交量是平均值的2倍以上
-                    alerts.append({
-                        "type": "HIGH_VOLUME",
-                        "symbol": symbol,
-                        "message": f"成交量异常: {volume_ratio:.2f}x 平均值",
-                        "severity": "medium",
-                        "timestamp": datetime.now().isoformat()
-                    })
-        except Exception as e:
-            logger.error(f"Error checking volume anomalies for {symbol}: {str(e)}")
+        if len(symbols) >= BATCH_SCAN_MIN_SYMBOLS:
+            try:
+                return self._record_alerts(self.scan_batch(symbols, context))
+            except Exception as e:
+                logger.error(f"Error in batch scan, falling back to per-symbol checks: {str(e)}")
         
-        return alerts
-    
-    def monitor_stocks(self, symbols: List[str]) -> List[Dict]:
-        """监控股票列表的风险和机会"""
-        all_alerts = []
+        quotes = context.get_quotes(symbols)
+        context.prefetch(symbols)
         
+        names, snapshots = [], []
         for symbol in symbols:
             try:
-                # 获取当前价格
-                stock_data = data_provider.get_stock_data(symbol, period='daily', days=1)
-                if stock_data.empty:
-                    continue
-                
-                current_price = stock_data.iloc[-1]['close']
+                # 优先使用全市场快照中的实时价格和成交量
+                quote = quotes.get(symbol)
+                if quote:
+                    current_price = quote['price']
+                    current_volume = quote['volume']
+                else:
+                    latest_data = context.get(symbol, days=1)
+                    if latest_data.empty:
+                        continue
+                    current_price = latest_data.iloc[-1]['close']
+                    current_volume = None
                 
-                # 检查各种信号
-                technical_alerts = self.check_technical_signals(symbol)
-                price_alerts = self.check_price_alerts(symbol, current_price)
-                volume_alerts = self.check_volume_anomalies(symbol)
-                
-                # 合并所有警报
-                symbol_alerts = technical_alerts + price_alerts + volume_alerts
-                
-                for alert in symbol_alerts:
-                    # 检查是否为重复警报（避免频繁推送）
-                    is_duplicate = False
-                    for existing in self.alerts[-10:]:  # 检查最近10个警报
-                        if (existing['symbol'] == alert['symbol'] and 
-                            existing['type'] == alert['type'] and
-                            abs((datetime.fromisoformat(existing['timestamp']) - 
-                                 datetime.fromisoformat(alert['timestamp'])).total_seconds()) < 300):  # 5分钟内
-                            is_duplicate = True
-                            break
-                    
-                    if not is_duplicate:
-                        all_alerts.append(alert)
-                        self.alerts.append(alert)
+                # 增量更新流式指标，已走完的K线只在第一次出现时计算
+                indicators = self.indicators.sync(symbol, context.get(symbol, days=TECHNICAL_LOOKBACK_DAYS),
+                                                  current_price if quote else None, current_volume,
+                                                  today=context.now.date())
+                if indicators is not None:
+                    names.append(symbol)
+                    snapshots.append(indicators)
                         
             except Exception as e:
                 logger.error(f"Error monitoring {symbol}: {str(e)}")
         
-        return all_alerts
+        # 所有股票的指标快照一起交给警报规则批量求值
+        return self._record_alerts(alert_rules.evaluate(names, stack_features(snapshots)))
+
+def _create_alert_store():
+    """按配置创建警报存储，失败时只保存在内存中"""
+    if not ALERT_STORE_ENABLED:
+        return None
+    try:
+        return AlertStore(ALERT_STORE_PATH)
+    except Exception as e:
+        logger.error(f"Error opening alert store {ALERT_STORE_PATH}: {str(e)}")
+        return None
 
 # 全球风险监控实例
-risk_monitor = RiskMonitor()
\ No newline at end of file
+risk_monitor = RiskMonitor(store=_create_alert_store())
\ No newline at end of file
@@ -4,13 +4,13 @@ Web界面模块
 """
 import os
 import json
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, stream_with_context
 from flask_cors import CORS
 import threading
 import time
 
 from config.settings import WATCHLIST
-from main import stock_system
+from monitoring.risk_monitor import risk_monitor
 from data.data_provider import data_provider
 from analysis.ai_analyzer import ai_analyzer
 
@@ -88,15 +88,61 @@ def analyze_stock(symbol):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stock/<symbol>/analyze/stream')
+def analyze_stock_stream(symbol):
+    """
+    流式AI分析股票（Server-Sent Events）
+    生成过程中发送 delta 事件（文本片段），最后发送 result 事件（与 /analyze 相同的分析结果），
+    失败时发送 analysis_error 事件
+    """
+    def events():
+        for event, data in ai_analyzer.analyze_stock_stream(symbol):
+            name = 'analysis_error' if event == 'error' else event
+            yield f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/alerts')
 def get_alerts():
-    """获取最新警报"""
-    # 返回最近的警报
+    """
+    查询警报
+    参数: since/until（ISO时间）、symbol、type、severity、cursor、limit（默认10）
+    返回按时间先后排列的警报列表，还有更早的警报时在 X-Next-Cursor 响应头中返回下一页游标
+    """
     try:
-        recent_alerts = getattr(stock_system.risk_monitor, 'alerts', [])[-10:]
-        return jsonify(recent_alerts)
-    except:
-        return jsonify([])
+        cursor = request.args.get('cursor', type=int)
+        limit = request.args.get('limit', default=10, type=int)
+        alerts, next_cursor = risk_monitor.query_alerts(
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            symbol=request.args.get('symbol'),
+            alert_type=request.args.get('type'),
+            severity=request.args.get('severity'),
+            cursor=cursor,
+            limit=limit
+        )
+        response = jsonify(alerts)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """获取行情缓存命中统计"""
+    return jsonify(data_provider.get_cache_stats())
+
+@app.route('/api/ai/cache/stats')
+def get_ai_cache_stats():
+    """获取AI回复缓存命中统计"""
+    return jsonify(ai_analyzer.get_cache_stats())
+
+@app.route('/api/sources/stats')
+def get_source_stats():
+    """获取数据源熔断状态和重试统计"""
+    return jsonify(data_provider.get_source_stats())
 
 def run_web_app():
     """运行Web应用"""